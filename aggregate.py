@@ -0,0 +1,107 @@
+import os
+import re
+import json
+import heapq
+import hashlib
+from itertools import islice
+from datetime import datetime
+
+# cross-channel feeds: newest `limit` messages of all channels, optionally filtered.
+# kept between runs, a run merges only what the channels got this time into the last result
+
+
+FIELDS = ('id', 'title', 'text', 'link', 'pub_date', 'channel')
+
+
+# newest first: pub_date, ties broken the same way every run
+def merge_key(message):
+    return (message['pub_date'], message['channel'], message['id'])
+
+
+def newest_first(messages):
+    return sorted(messages, key=merge_key, reverse=True)
+
+
+# list.json "filtered_feeds" entry:
+#   {"name": "cve", "title": "CVE", "keywords": ["cve-"], "regex": "...", "channels": [...]}
+# keywords match case-insensitive substrings of title + text, either keywords or regex is enough
+class FeedFilter:
+    def __init__(self, definition, limit=100):
+        self.definition = definition
+        self.name = definition['name']
+        self.limit = int(definition.get('limit', limit))
+        self.channels = set(definition['channels']) if definition.get('channels') else None
+        self.keywords = [k.lower() for k in definition.get('keywords', [])]
+        self.regex = re.compile(definition['regex'], re.IGNORECASE) if definition.get('regex') else None
+
+        # a changed definition means the saved result is no good
+        self.fingerprint = hashlib.sha256(
+            json.dumps([definition, self.limit], sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:16]
+
+    def matches(self, message):
+        if self.channels is not None and message['channel'] not in self.channels:
+            return False
+        if not self.keywords and self.regex is None:
+            return True
+
+        text = f"{message['title']}\n{message['text']}"
+        if self.keywords:
+            lowered = text.lower()
+            if any(keyword in lowered for keyword in self.keywords):
+                return True
+        return self.regex is not None and self.regex.search(text) is not None
+
+    # a repost goes when the feed may have the first copy
+    def collapsed(self, message, channels, canonical):
+        if canonical is None:
+            return False
+        first = canonical(message['channel'], message['id'])
+        if first is None or first[0] not in channels:
+            return False
+        return self.channels is None or first[0] in self.channels
+
+    # previous: last result, streams: newest-first messages per channel, merged lazily
+    # (k-way heap merge), so only about `limit` messages are filtered and compared.
+    # a message in the streams replaces its older copy in previous; channels: the ones still configured.
+    # canonical(channel, id): first (channel, id) of a story reposted across channels, see dedup.py
+    def merge(self, previous, streams, channels, canonical=None):
+        kept = []
+        if previous:
+            # an edit may also make a message drop out
+            streams = [list(stream) for stream in streams]
+            replaced = {(m['channel'], m['id']) for stream in streams for m in stream}
+            kept = [
+                m for m in previous
+                if m['channel'] in channels and (m['channel'], m['id']) not in replaced
+            ]
+
+        streams = [
+            ({k: m[k] for k in FIELDS} for m in stream if self.matches(m) and not self.collapsed(m, channels, canonical))
+            for stream in streams
+        ]
+        merged = heapq.merge(kept, *streams, key=merge_key, reverse=True)
+        return list(islice(merged, self.limit))
+
+
+# channel_data/.<name>_aggregate: {"filter": fingerprint, "items": [...]}
+def load_aggregate(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None, []
+
+    items = [dict(item, pub_date=datetime.fromisoformat(item['pub_date'])) for item in data.get('items', [])]
+    return data.get('filter'), items
+
+
+def save_aggregate(path, fingerprint, items):
+    data = {
+        'filter': fingerprint,
+        'items': [dict(item, pub_date=item['pub_date'].isoformat()) for item in items]
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import logging
+from datetime import datetime, timezone
+
+# shared by the sqlite and segment log stores (archive_db.py, segment_log.py):
+# json export and the import/export command line
+
+
+# for a store with load_records() and last_message_id()
+class JsonExport:
+    # channel_data/<name>.json layout, for compatibility
+    def export_json(self, channel_name, data_filename=None):
+        data_filename = data_filename or f"channel_data/{channel_name}.json"
+        records = self.load_records(channel_name)
+
+        data = {
+            'channel': channel_name,
+            'last_update': datetime.now(timezone.utc).isoformat(),
+            'messages_count': len(records),
+            'last_message_id': self.last_message_id(channel_name),
+            'messages': records
+        }
+
+        with open(data_filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return data_filename
+
+
+# python <store>.py import|export|<extra> [path]; extra: command -> function(store, channel)
+def run_command_line(store_class, default_path, extra=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    extra = extra or {}
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    store = store_class(sys.argv[2] if len(sys.argv) > 2 else default_path)
+
+    if command == 'import':
+        for name in sorted(os.listdir('channel_data')):
+            if name.endswith('.json') and not name.startswith('.'):
+                store.import_json(os.path.join('channel_data', name))
+    elif command == 'export':
+        for channel_name in store.channels():
+            print(f"✓ {store.export_json(channel_name)}")
+    elif command in extra:
+        for channel_name in store.channels():
+            extra[command](store, channel_name)
+    else:
+        commands = ['import', 'export', *extra]
+        print(f"Unknown command: {command} (use {', '.join(commands[:-1])} or {commands[-1]})")
+
+    store.close()
@@ -0,0 +1,226 @@
+import sqlite3
+import json
+import os
+import threading
+import logging
+from datetime import datetime, timezone, timedelta
+from archive_common import JsonExport, run_command_line
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    channel TEXT NOT NULL,
+    id TEXT NOT NULL,
+    num INTEGER,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    link TEXT NOT NULL,
+    pub_date TEXT NOT NULL,
+    edited TEXT,
+    raw_hash TEXT,
+    PRIMARY KEY (channel, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_pub_date ON messages (channel, pub_date DESC);
+CREATE INDEX IF NOT EXISTS messages_num ON messages (channel, num DESC);
+CREATE TABLE IF NOT EXISTS imports (
+    channel TEXT PRIMARY KEY,
+    imported TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# only touch rows that really changed
+UPSERT = """
+INSERT INTO messages (channel, id, num, title, text, link, pub_date, edited, raw_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (channel, id) DO UPDATE SET
+    title = excluded.title,
+    text = excluded.text,
+    link = excluded.link,
+    pub_date = excluded.pub_date,
+    edited = excluded.edited,
+    raw_hash = excluded.raw_hash
+WHERE title != excluded.title OR text != excluded.text
+    OR link != excluded.link OR pub_date != excluded.pub_date
+    OR edited IS NOT excluded.edited OR raw_hash IS NOT excluded.raw_hash
+"""
+
+RECORD_FIELDS = ('id', 'title', 'text', 'link', 'pub_date')
+SELECT_RECORD = 'SELECT id, title, text, link, pub_date, edited, raw_hash FROM messages'
+
+
+# same dicts as channel_data/*.json: 'edited' only on edited messages, 'raw_hash' when known
+def row_record(row):
+    record = dict(zip(RECORD_FIELDS, row))
+    if row[5]:
+        record['edited'] = row[5]
+    if row[6]:
+        record['raw_hash'] = row[6]
+    return record
+
+
+# message archive for all channels in one sqlite file.
+# readonly (--dry-run): the file is never created or migrated, an old one is migrated in memory
+class SQLiteArchive(JsonExport):
+    def __init__(self, path='channel_data/archive.db', readonly=False):
+        self.path = path
+        self.lock = threading.Lock()
+
+        if readonly:
+            self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+            if os.path.exists(path):
+                with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as source:
+                    source.backup(self.conn)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.executescript(SCHEMA)
+
+        # archives from before edit tracking and raw hashes
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(messages)')}
+        if 'edited' not in columns:
+            self.conn.execute('ALTER TABLE messages ADD COLUMN edited TEXT')
+        if 'raw_hash' not in columns:
+            self.conn.execute('ALTER TABLE messages ADD COLUMN raw_hash TEXT')
+
+        # archives from before import tracking: channels with rows came from their json
+        if 'messages' in tables and 'imports' not in tables:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO imports (channel, imported) SELECT DISTINCT channel, ? FROM messages',
+                    (datetime.now(timezone.utc).isoformat(),)
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def has_channel(self, channel_name):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM messages WHERE channel = ? LIMIT 1', (channel_name,)
+            ).fetchone()
+        return row is not None
+
+    # json archive taken over already; stays true when retention empties the channel
+    def imported(self, channel_name):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM imports WHERE channel = ?', (channel_name,)
+            ).fetchone()
+        return row is not None
+
+    def channels(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT DISTINCT channel FROM messages ORDER BY channel').fetchall()
+        return [row[0] for row in rows]
+
+    # newest first, same dicts as channel_data/*.json
+    def load_records(self, channel_name, limit=None):
+        query = f"{SELECT_RECORD} WHERE channel = ? ORDER BY pub_date DESC, num DESC"
+        params = [channel_name]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [row_record(row) for row in rows]
+
+    # the stored copies of these ids, the ones not archived (any more) left out
+    def load_ids(self, channel_name, ids):
+        ids = list(ids)
+        rows = []
+        with self.lock:
+            # under sqlite's variable limit
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows += self.conn.execute(
+                    f"{SELECT_RECORD} WHERE channel = ? AND id IN ({','.join('?' * len(batch))})",
+                    [channel_name, *batch]
+                ).fetchall()
+        return [row_record(row) for row in rows]
+
+    def count(self, channel_name):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE channel = ?', (channel_name,)
+            ).fetchone()[0]
+
+    def last_message_id(self, channel_name):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT MAX(num) FROM messages WHERE channel = ?', (channel_name,)
+            ).fetchone()
+        return row[0]
+
+    def upsert(self, channel_name, records):
+        rows = [
+            (
+                channel_name,
+                record['id'],
+                int(record['id']) if record['id'].isdigit() else None,
+                record['title'],
+                record['text'],
+                record['link'],
+                record['pub_date'],
+                record.get('edited'),
+                record.get('raw_hash')
+            )
+            for record in records
+        ]
+
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(UPSERT, rows)
+            return self.conn.total_changes - before
+
+    # keep newest max_count and/or max_days
+    def apply_retention(self, channel_name, max_count=None, max_days=None):
+        removed = 0
+
+        with self.lock, self.conn:
+            if max_days is not None:
+                cutoff = (datetime.now(timezone.utc) - timedelta(days=max_days)).isoformat()
+                removed += self.conn.execute(
+                    'DELETE FROM messages WHERE channel = ? AND pub_date < ?',
+                    (channel_name, cutoff)
+                ).rowcount
+
+            if max_count is not None:
+                removed += self.conn.execute(
+                    """DELETE FROM messages WHERE channel = ? AND id NOT IN (
+                        SELECT id FROM messages WHERE channel = ? ORDER BY pub_date DESC LIMIT ?
+                    )""",
+                    (channel_name, channel_name, int(max_count))
+                ).rowcount
+
+        if removed:
+            logger.info(f"✓ Retention: {removed} old messages removed from {channel_name}")
+        return removed
+
+    def import_json(self, data_filename):
+        with open(data_filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        channel_name = data['channel']
+        self.upsert(channel_name, data.get('messages', []))
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO imports (channel, imported) VALUES (?, ?)',
+                (channel_name, datetime.now(timezone.utc).isoformat())
+            )
+        logger.info(f"✓ Imported {len(data.get('messages', []))} messages of {channel_name} into {self.path}")
+        return channel_name
+
+
+# python archive_db.py import|export [db path]
+def main():
+    run_command_line(SQLiteArchive, 'channel_data/archive.db')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+
+# offline timing of every update.py stage against the local t.me stand-in:
+#   python benchmarks/bench_stages.py                                  -> real channel_data
+#   python benchmarks/bench_stages.py --channels 1000 --messages 100000
+#   python benchmarks/bench_stages.py --out new.json --compare old.json
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from update import TelegramRSSGenerator
+from sanitizer import sanitize_sensitive_data
+from fixtures import load_archives, synthetic_archives
+from tme_server import TMEServer
+
+STAGES = (
+    'fetch',
+    'parse_message_widget',
+    'sanitize_sensitive_data',
+    'load_channel_state',
+    'generate_rss_feed',
+    'save_channel_data',
+    'update_all_channels',
+)
+
+
+def load_channel_configs():
+    with open(os.path.join(ROOT, 'list.json'), 'r', encoding='utf-8') as f:
+        return {c['name']: c for c in json.load(f)['channels']}
+
+
+# work dir as a previous run left it: archives minus the newest `new` posts, all channels initialized
+def build_workdir(path, archives, configs, settings, new=5):
+    os.makedirs(os.path.join(path, 'channel_data'), exist_ok=True)
+
+    channels = []
+    for channel_name, messages in archives.items():
+        channels.append(configs.get(channel_name) or {
+            'name': channel_name,
+            'title': channel_name,
+            'title_line': 0,
+            'initial_limit': 30,
+            'regular_limit': 5
+        })
+
+        stored = messages[:-new] if new else messages
+        ids = [int(m['id']) for m in stored if m['id'].isdigit()]
+        data = {
+            'channel': channel_name,
+            'last_update': datetime.now(timezone.utc).isoformat(),
+            'messages_count': len(stored),
+            'last_message_id': max(ids) if ids else None,
+            'messages': sorted(stored, key=lambda x: x['pub_date'], reverse=True)
+        }
+        with open(os.path.join(path, 'channel_data', f"{channel_name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(path, 'channel_data', f".{channel_name}_initialized"), 'w') as f:
+            f.write(data['last_update'])
+
+    with open(os.path.join(path, 'list.json'), 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'channels': channels}, f, ensure_ascii=False, indent=2)
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds, items):
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0})
+        stage['seconds'] += seconds
+        stage['items'] += items
+
+    def time(self, name, func, *args, items=1):
+        started = time.perf_counter()
+        result = func(*args)
+        self.add(name, time.perf_counter() - started, items)
+        return result
+
+    def results(self):
+        results = {}
+        for name in STAGES:
+            if name not in self.stages:
+                continue
+            stage = self.stages[name]
+            results[name] = {
+                'seconds': round(stage['seconds'], 6),
+                'items': stage['items'],
+                'us_per_item': round(stage['seconds'] / stage['items'] * 1e6, 2) if stage['items'] else None
+            }
+        return results
+
+
+def timer_run(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+# stage by stage, same order process_channel runs them in
+def run_stages(generator, server, timer, repeat):
+    pages = {}
+    for channel_config in generator.channels['channels']:
+        channel_name = channel_config['name']
+        pages[channel_name] = timer.time('fetch', generator.fetch_page, f"{server.base_url}{channel_name}")
+
+    # in-memory stages: best of `repeat`
+    fetched = {}
+    for channel_config in generator.channels['channels']:
+        channel_name = channel_config['name']
+        widgets = generator.get_parser().widgets(pages[channel_name])
+        parse = lambda: [generator.parse_message_widget(w, channel_name, channel_config) for w in widgets]
+
+        timer.add('parse_message_widget', min(timer_run(parse) for _ in range(repeat)), len(widgets))
+        fetched[channel_name] = [m for m in parse() if m]
+
+    texts = [m['text'] for messages in fetched.values() for m in messages]
+    sanitize = lambda: [sanitize_sensitive_data(t) for t in texts]
+    timer.add('sanitize_sensitive_data', min(timer_run(sanitize) for _ in range(repeat)), len(texts))
+
+    # disk stages: once, items = archive size after the merge
+    for channel_config in generator.channels['channels']:
+        channel_name = channel_config['name']
+        state = timer.time('load_channel_state', generator.load_channel_state, channel_name)
+        last_id = state.last_message_id
+        messages = [m for m in fetched[channel_name] if last_id is None or not m['id'].isdigit() or int(m['id']) > last_id]
+
+        started = time.perf_counter()
+        generator.generate_rss_feed(channel_config, messages, state)
+        timer.add('generate_rss_feed', time.perf_counter() - started, len(state.messages))
+
+        started = time.perf_counter()
+        generator.save_channel_data(channel_name, messages, state)
+        timer.add('save_channel_data', time.perf_counter() - started, len(state.messages))
+
+
+def run_full_update(generator, timer):
+    results = timer.time('update_all_channels', generator.update_all_channels, items=len(generator.channels['channels']))
+    return {status: sum(1 for r in results if r['status'] == status) for status in ('ok', 'unchanged', 'empty', 'error')}
+
+
+def compare(results, previous_file):
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+
+    print(f"\n{'stage':<24}{'before':>12}{'after':>12}{'change':>10}")
+    for name, stage in results['stages'].items():
+        old = previous.get('stages', {}).get(name)
+        if not old or not old['seconds']:
+            print(f"{name:<24}{'-':>12}{stage['seconds']:>11.3f}s{'':>10}")
+            continue
+        change = (stage['seconds'] / old['seconds'] - 1) * 100
+        print(f"{name:<24}{old['seconds']:>11.3f}s{stage['seconds']:>11.3f}s{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time update.py stages offline')
+    parser.add_argument('--channels', type=int, help='synthetic channels (default: real channel_data)')
+    parser.add_argument('--messages', type=int, default=100000, help='synthetic archived messages in total')
+    parser.add_argument('--new', type=int, default=5, help='posts per channel the archive is behind')
+    parser.add_argument('--repeat', type=int, default=3, help='repeats of the in-memory stages')
+    parser.add_argument('--settings', default='{}', help='json merged into list.json settings')
+    parser.add_argument('--out', help='write results json here')
+    parser.add_argument('--compare', help='previous results json')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.channels:
+        archives = synthetic_archives(args.channels, args.messages)
+        dataset = f"synthetic-{args.channels}x{args.messages}"
+    else:
+        archives = load_archives(ROOT)
+        dataset = 'channel_data'
+    configs = load_channel_configs()
+
+    cwd = os.getcwd()
+    tmp = tempfile.mkdtemp(prefix='tg-bench-')
+    timer = StageTimer()
+
+    try:
+        with TMEServer(archives) as server:
+            settings = dict({'delay': 0}, **json.loads(args.settings), base_url=server.base_url)
+
+            template = os.path.join(tmp, 'template')
+            build_workdir(template, archives, configs, settings, args.new)
+
+            # stages one by one, then the full run on an untouched copy
+            shutil.copytree(template, os.path.join(tmp, 'stages'))
+            os.chdir(os.path.join(tmp, 'stages'))
+            generator = TelegramRSSGenerator()
+            try:
+                run_stages(generator, server, timer, args.repeat)
+            finally:
+                generator.close_process_pool()
+                generator.close_archive_db()
+
+            shutil.copytree(template, os.path.join(tmp, 'full'))
+            os.chdir(os.path.join(tmp, 'full'))
+            statuses = run_full_update(TelegramRSSGenerator(), timer)
+
+            requests_served = server.requests
+            bytes_served = server.bytes_sent
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {
+        'dataset': dataset,
+        'channels': len(archives),
+        'messages': sum(len(m) for m in archives.values()),
+        'settings': settings,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'requests': requests_served,
+        'bytes': bytes_served,
+        'statuses': statuses,
+        'stages': timer.results()
+    }
+
+    print(f"{dataset}: {results['channels']} channels, {results['messages']} messages, {requests_served} requests")
+    for name, stage in results['stages'].items():
+        print(f"  {name:<24}{stage['seconds']:>10.3f}s  {stage['items']:>7} items  {stage['us_per_item']:>10} us/item")
+    print(f"  full run: {statuses}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 1 if statuses['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
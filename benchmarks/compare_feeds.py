@@ -0,0 +1,114 @@
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import feedgenerator
+
+# feed_writer's rss must equal feedgenerator's byte for byte on the saved archives:
+#   python benchmarks/compare_feeds.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import feed_writer
+from feed_writer import FEED_HISTORY_NS, render_feed
+from fixtures import load_archives
+from compare_parsers import load_channel_configs
+
+
+# the renderer update.py used before feed_writer.py
+class LinkedRssFeed(feedgenerator.Rss201rev2Feed):
+    def rss_attributes(self):
+        attrs = super().rss_attributes()
+        if self.feed.get('archive'):
+            attrs['xmlns:fh'] = FEED_HISTORY_NS
+        return attrs
+
+    def add_root_elements(self, handler):
+        super().add_root_elements(handler)
+        for rel, href in self.feed.get('links') or ():
+            handler.addQuickElement('atom:link', None, {'href': href, 'rel': rel, 'type': 'application/rss+xml'})
+        if self.feed.get('archive'):
+            handler.addQuickElement('fh:archive', None)
+
+
+def render_reference(channel_config, records, links=(), archive=False):
+    channel_name = channel_config['name']
+    feed = LinkedRssFeed(
+        title=channel_config.get('title', f"Channel @{channel_name}"),
+        link=f"https://t.me/{channel_name}",
+        description=channel_config.get('description', f"RSS of @{channel_name}"),
+        language='ru',
+    )
+    feed.feed['links'] = list(links)
+    feed.feed['archive'] = archive
+
+    for message_id, title, text, link, pub_date in records:
+        feed.add_item(
+            title=title,
+            link=link,
+            description=text,
+            pubdate=pub_date,
+            unique_id=f"telegram_{channel_name}_{message_id}",
+            unique_id_is_permalink=False
+        )
+    return feed.writeString('utf-8')
+
+
+# archive messages -> records, newest first
+def archive_records(messages):
+    records = [
+        (m['id'], m['title'], m['text'], m['link'], datetime.fromisoformat(m['pub_date']).astimezone(timezone.utc))
+        for m in messages
+    ]
+    return sorted(records, key=lambda r: r[4], reverse=True)
+
+
+def main():
+    configs = load_channel_configs()
+    base = 'https://example.github.io/feeds/'
+
+    cases = []
+    for channel_name, messages in load_archives(ROOT).items():
+        config = configs.get(channel_name, {'name': channel_name})
+        records = archive_records(messages)
+        links = [('self', f"{base}{channel_name}.xml"), ('prev-archive', f"{base}archive/{channel_name}/1.xml")]
+        cases.append((config, records, (), False))
+        cases.append((config, records, links, False))
+        cases.append((config, records[-10:], [('current', f"{base}{channel_name}.xml")], True))
+
+    mismatches = 0
+    for config, records, links, archive in cases:
+        expected = render_reference(config, records, links, archive)
+        actual = render_feed('rss', config, records, links=links, archive=archive)
+        if actual != expected:
+            mismatches += 1
+            at = next((i for i, (a, b) in enumerate(zip(actual, expected)) if a != b), min(len(actual), len(expected)))
+            print(f"MISMATCH {config['name']} (links={len(links)}, archive={archive}) at {at}")
+            print(f"  feedgenerator: {expected[max(at - 60, 0):at + 60]!r}")
+            print(f"  feed_writer:   {actual[max(at - 60, 0):at + 60]!r}")
+
+    items = sum(len(c[1]) for c in cases)
+    print(f"feeds: {len(cases)}, items: {items}")
+    print(f"mismatches: {mismatches}")
+
+    repeat = int(os.environ.get('BENCH_REPEAT', 5))
+    timings = {
+        'feedgenerator': lambda: [render_reference(*c) for c in cases],
+        'feed_writer': lambda: [render_feed('rss', c[0], c[1], links=c[2], archive=c[3]) for c in cases],
+    }
+    reference = None
+    for name, run in timings.items():
+        if name == 'feed_writer':
+            feed_writer.fragment_cache.entries.clear()
+            cold = timeit.timeit(run, number=1)
+            print(f"{'cold cache':>13}: {cold * 1000:.1f} ms")
+        elapsed = min(timeit.repeat(run, number=1, repeat=repeat))
+        reference = reference or elapsed
+        print(f"{name:>13}: {elapsed * 1000:.1f} ms for all feeds ({reference / elapsed:.1f}x)")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
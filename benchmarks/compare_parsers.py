@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import glob
+import timeit
+import importlib.util
+
+# every parser backend must give the bs4 reference output on the saved pages:
+#   python benchmarks/compare_parsers.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tme_parser import MessageParser
+from fixtures import FIXTURES_DIR, build_fixtures
+
+
+def load_channel_configs():
+    with open(os.path.join(ROOT, 'list.json'), 'r', encoding='utf-8') as f:
+        return {c['name']: c for c in json.load(f)['channels']}
+
+
+def parse_fixture(parser, content, channel_name, channel_config):
+    results = []
+    for widget in parser.widgets(content):
+        fields = parser.backend.extract(widget)
+        message = parser.parse_widget(widget, channel_name, channel_config)
+        # no datetime in markup -> pub_date is "now", not comparable
+        if message and fields and not fields[1]:
+            message = dict(message, pub_date=None)
+        results.append((parser.widget_id(widget), fields, message))
+    return results
+
+
+def main():
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if not fixtures:
+        fixtures = build_fixtures()
+
+    backends = ['bs4', 'strainer']
+    if importlib.util.find_spec('lxml'):
+        backends.append('lxml')
+    parsers = {name: MessageParser(name) for name in backends}
+    configs = load_channel_configs()
+
+    pages = []
+    for path in fixtures:
+        channel_name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as f:
+            pages.append((channel_name, f.read(), configs.get(channel_name)))
+
+    mismatches = 0
+    widgets = 0
+    for channel_name, content, channel_config in pages:
+        expected = parse_fixture(parsers['bs4'], content, channel_name, channel_config)
+        widgets += len(expected)
+
+        for name in backends[1:]:
+            actual = parse_fixture(parsers[name], content, channel_name, channel_config)
+            if actual != expected:
+                mismatches += 1
+                print(f"MISMATCH {name} on {channel_name}")
+                for exp, act in zip(expected, actual):
+                    if exp != act:
+                        print(f"  bs4:   {exp}\n  {name}: {act}")
+                        break
+
+    print(f"fixtures: {len(pages)} pages, {widgets} widgets, backends: {', '.join(backends)}")
+    print(f"mismatches: {mismatches}")
+
+    repeat = int(os.environ.get('BENCH_REPEAT', 5))
+    reference = None
+    for name in backends:
+        parser = parsers[name]
+        elapsed = min(timeit.repeat(
+            lambda: [parser.parse_page(content, c, cfg) for c, content, cfg in pages],
+            number=1, repeat=repeat
+        ))
+        reference = reference or elapsed
+        print(f"{name:>9}: {elapsed * 1000:.1f} ms for all pages ({reference / elapsed:.1f}x)")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import os
+import sys
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# local stand-in for t.me/s/<channel>[?before=<id>], pages rendered from archives:
+#   python benchmarks/tme_server.py [port]     -> serves channel_data
+# point update.py at it with "settings": {"base_url": "http://127.0.0.1:<port>/s/"}
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import ROOT, PAGE_SIZE, load_archives, page_for
+
+
+class TMEServer:
+    # archives: channel -> messages, ids ascending (see fixtures.load_archives)
+    def __init__(self, archives, host='127.0.0.1', port=0, page_size=PAGE_SIZE, etags=True):
+        self.archives = archives
+        self.page_size = page_size
+        self.etags = etags
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/s/"
+
+    def render(self, path):
+        url = urlparse(path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 's' or parts[1] not in self.archives:
+            return None
+
+        before = parse_qs(url.query).get('before')
+        before = int(before[0]) if before and before[0].isdigit() else None
+        return page_for(parts[1], self.archives[parts[1]], before, self.page_size)
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out as separate writes
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                body = server.render(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+
+                etag = f'"{hashlib.sha1(body).hexdigest()}"' if server.etags else None
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    body = b''
+                else:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    if etag:
+                        self.send_header('ETag', etag)
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                with server.lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = TMEServer(load_archives(ROOT), port=port)
+    print(f"serving {len(server.archives)} channels on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import os
+import re
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 64-bit simhash over word bigrams; links, mentions and hashtags differ between reposts
+URLS = re.compile(r'https?://\S+|www\.\S+|[@#]\w+')
+WORDS = re.compile(r'\w{2,}')
+
+# shorter texts ("Photo", "Video", a link) say nothing about the story
+MIN_WORDS = 8
+
+
+def features(text):
+    words = WORDS.findall(URLS.sub(' ', text.lower()))
+    if len(words) < MIN_WORDS:
+        return []
+    return [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+# per-bit counters as 20-bit lanes of one big int: a shingle is added with one sum
+# of 8 table lookups instead of 64 increments
+LANE = 20
+LANE_MASK = (1 << LANE) - 1
+SPREAD = [
+    [sum(1 << ((position * 8 + bit) * LANE) for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+    for position in range(8)
+]
+
+
+def simhash(text):
+    shingles = features(text)
+    if not shingles:
+        return None
+
+    s0, s1, s2, s3, s4, s5, s6, s7 = SPREAD
+    lanes = 0
+    for shingle in shingles:
+        d = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        lanes += s0[d[0]] + s1[d[1]] + s2[d[2]] + s3[d[3]] + s4[d[4]] + s5[d[5]] + s6[d[6]] + s7[d[7]]
+
+    # bit set where more than half of the shingles have it
+    half = len(shingles) / 2
+    return sum(1 << bit for bit in range(64) if (lanes >> (bit * LANE) & LANE_MASK) > half)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# simhash of every archived message + LSH buckets: the hash cut into distance + 1 bands,
+# two hashes within `distance` bits share at least one band (pigeonhole), so a lookup
+# only compares against messages in the same buckets.
+# kept in one append-only file, a line per message:
+#   <channel>\t<id>\t<hash hex>\t<canonical channel/id or ->
+class NearDuplicateIndex:
+    def __init__(self, path='channel_data/.fingerprints', distance=3):
+        self.path = path
+        self.distance = distance
+        self.bands = distance + 1
+        self.band_bits = 64 // self.bands
+        self.entries = {}  # (channel, id) -> (hash, canonical key or None)
+        self.buckets = {}  # (band, value) -> [(channel, id)]
+        self.pending = []
+        self.lock = threading.Lock()
+        self.load()
+
+    def band_keys(self, value):
+        mask = (1 << self.band_bits) - 1
+        return [(band, value >> (band * self.band_bits) & mask) for band in range(self.bands)]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) != 4:
+                    continue
+                canonical = tuple(parts[3].split('/', 1)) if parts[3] != '-' else None
+                self.insert((parts[0], parts[1]), int(parts[2], 16), canonical)
+
+    def insert(self, key, value, canonical):
+        self.entries[key] = (value, canonical)
+        for band_key in self.band_keys(value):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    # nearest message of another channel within `distance` bits
+    def find(self, channel_name, value):
+        best = None
+        seen = set()
+        for band_key in self.band_keys(value):
+            for key in self.buckets.get(band_key, ()):
+                if key[0] == channel_name or key in seen:
+                    continue
+                seen.add(key)
+                # bucket entries of edited messages may be stale
+                current = self.entries[key][0]
+                distance = hamming(current, value)
+                if distance <= self.distance and (best is None or distance < best[0]):
+                    best = (distance, key)
+        return best[1] if best else None
+
+    # returns the canonical (channel, id) when the message repeats an earlier one
+    def add(self, channel_name, message_id, text):
+        key = (channel_name, message_id)
+        value = simhash(text)
+        if value is None:
+            return None
+
+        with self.lock:
+            known = self.entries.get(key)
+            if known is not None and known[0] == value:
+                return known[1]
+
+            canonical = self.find(channel_name, value)
+            if canonical is not None:
+                # point at the first of the story, not at another repost
+                canonical = self.entries[canonical][1] or canonical
+
+            self.insert(key, value, canonical)
+            self.pending.append(f"{channel_name}\t{message_id}\t{value:016x}\t{'/'.join(canonical) if canonical else '-'}\n")
+            return canonical
+
+    def canonical(self, channel_name, message_id):
+        entry = self.entries.get((channel_name, message_id))
+        return entry[1] if entry else None
+
+    def save(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(self.pending)
+            written = len(self.pending)
+            self.pending = []
+            return written
@@ -0,0 +1,260 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import hashlib
+import logging
+import threading
+import importlib.util
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from index import render_html_page
+
+# optional: brotli bodies next to gzip
+brotli = None
+if importlib.util.find_spec('brotli'):
+    import brotli
+
+logger = logging.getLogger(__name__)
+
+RSS_TYPE = 'application/rss+xml; charset=utf-8'
+HTML_TYPE = 'text/html; charset=utf-8'
+
+# feed format -> (url suffix, content type), see feed_writer.py
+FEED_TYPES = {
+    'rss': ('.xml', RSS_TYPE),
+    'atom': ('.atom', 'application/atom+xml; charset=utf-8'),
+    'json': ('.json', 'application/feed+json; charset=utf-8'),
+}
+
+
+# one rendered document, bodies for every encoding precomputed; never changed after creation
+class FeedEntry:
+    def __init__(self, body, content_type, immutable=False):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        self.digest = digest
+        self.content_type = content_type
+        self.immutable = immutable
+        self.last_modified = formatdate(usegmt=True)
+        self.bodies = {'identity': body}
+
+        compressed = gzip.compress(body, 9, mtime=0)
+        if len(compressed) < len(body):
+            self.bodies['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body)
+            if len(compressed) < len(body):
+                self.bodies['br'] = compressed
+
+        # strong etag per representation
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+
+# url path -> FeedEntry; publish() swaps a whole entry, readers see the old or the new one
+class FeedStore:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    # returns False when the body is the same as what is served
+    def publish(self, path, body, content_type=RSS_TYPE, immutable=False):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        current = self.entries.get(path)
+        if current is not None and current.digest == hashlib.sha256(body).hexdigest()[:32]:
+            return False
+
+        self.entries[path] = FeedEntry(body, content_type, immutable)
+        return True
+
+    def publish_feed(self, channel_name, body, fmt='rss'):
+        suffix, content_type = FEED_TYPES[fmt]
+        return self.publish(f"/{channel_name}{suffix}", body, content_type)
+
+    # RFC 5005 archive pages never change once written
+    def publish_archive_page(self, channel_name, number, xml):
+        return self.publish(f"/archive/{channel_name}/{number}.xml", xml, RSS_TYPE, immutable=True)
+
+    def publish_index(self, registry):
+        html = render_html_page(registry).encode('utf-8')
+        self.publish('/index.html', html, HTML_TYPE)
+        self.entries['/'] = self.entries['/index.html']
+
+    # what the last run left on disk
+    def load_feeds(self, rss_dir='rss_feeds'):
+        for suffix, content_type in FEED_TYPES.values():
+            for path in sorted(glob.glob(os.path.join(rss_dir, f"*{suffix}"))):
+                with open(path, 'rb') as f:
+                    self.publish(f"/{os.path.basename(path)}", f.read(), content_type)
+
+        for path in sorted(glob.glob(os.path.join(rss_dir, 'archive', '*', '*.xml'))):
+            channel_name = os.path.basename(os.path.dirname(path))
+            number = os.path.splitext(os.path.basename(path))[0]
+            with open(path, 'rb') as f:
+                self.publish_archive_page(channel_name, number, f.read())
+        return len(self.entries)
+
+
+# best encoding the client accepts (q=0 means no)
+def choose_encoding(accept_encoding, available):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+def etag_matches(if_none_match, etags):
+    if if_none_match.strip() == '*':
+        return True
+    values = set(etags.values())
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        # weak comparison, as If-None-Match asks for
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in values:
+            return True
+    return False
+
+
+class FeedServer:
+    def __init__(self, store, host='127.0.0.1', port=8080, max_age=60):
+        self.store = store
+        self.max_age = max_age
+        self.stats = {'requests': 0, 'not_modified': 0}
+        self.stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_HEAD(self):
+                self.respond(head=True)
+
+            def do_GET(self):
+                self.respond(head=False)
+
+            def respond(self, head):
+                entry = server.store.get(self.path.split('?', 1)[0])
+                if entry is None:
+                    self.send_error(404)
+                    return
+
+                encoding = choose_encoding(self.headers.get('Accept-Encoding'), entry.bodies)
+                not_modified = self.not_modified(entry)
+                with server.stats_lock:
+                    server.stats['requests'] += 1
+                    server.stats['not_modified'] += not_modified
+
+                if not_modified:
+                    self.send_response(304)
+                    self.send_common_headers(entry, encoding)
+                    self.end_headers()
+                    return
+
+                body = entry.bodies[encoding]
+                self.send_response(200)
+                self.send_common_headers(entry, encoding)
+                self.send_header('Content-Type', entry.content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Last-Modified', entry.last_modified)
+                if encoding != 'identity':
+                    self.send_header('Content-Encoding', encoding)
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def not_modified(self, entry):
+                if_none_match = self.headers.get('If-None-Match')
+                if if_none_match is not None:
+                    return etag_matches(if_none_match, entry.etags)
+
+                if_modified_since = self.headers.get('If-Modified-Since')
+                if if_modified_since:
+                    try:
+                        return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(entry.last_modified)
+                    except (TypeError, ValueError):
+                        return False
+                return False
+
+            def send_common_headers(self, entry, encoding):
+                self.send_header('ETag', entry.etags[encoding])
+                if entry.immutable:
+                    self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+                else:
+                    self.send_header('Cache-Control', f"public, max-age={server.max_age}")
+                self.send_header('Vary', 'Accept-Encoding')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"✓ Serving feeds on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# serve what is on disk, no updating: python feed_server.py [port]
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with open('list.json', 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+
+    store = FeedStore()
+    store.load_feeds()
+    store.publish_index(registry)
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = FeedServer(store, port=port)
+    logger.info(f"✓ Serving {len(store.entries) - 2} feeds on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
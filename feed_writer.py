@@ -0,0 +1,291 @@
+import os
+import re
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import quote
+
+# streaming feed writers: records (newest first) in, text out item by item.
+# a record is (id, title, text, link, pub_date[, source channel[, edited[, revision]]]); the source is set
+# in cross-channel feeds, edited (datetime) and revision (content hash, goes into the guid) on edited posts
+# rss output is byte-identical to feedgenerator's Rss201rev2Feed (benchmarks/compare_feeds.py)
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+FEED_HISTORY_NS = 'http://purl.org/syndication/history/1.0'
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+
+# serialized items kept per process, enough for every head feed of a big list
+FRAGMENT_CACHE_SIZE = 50000
+
+# not allowed in xml 1.0 (feedgenerator refuses them too)
+CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B-\x0C\x0E-\x1F]')
+
+
+# same output as xml.sax.saxutils, which pulls in urllib.request (and ssl) on import
+def escape(data):
+    return data.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')
+
+
+def quoteattr(data):
+    data = escape(data).replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;')
+    if '"' in data:
+        if "'" in data:
+            return '"%s"' % data.replace('"', '&quot;')
+        return "'%s'" % data
+    return '"%s"' % data
+
+
+def iri_to_uri(iri):
+    return quote(iri, safe="/#%[]=:;$&()+,!?*@'~")
+
+
+def element(name, value, attrs=None):
+    attr_text = ''.join(f" {k}={quoteattr(v)}" for k, v in sorted((attrs or {}).items()))
+    if not value:
+        return f"<{name}{attr_text}/>"
+    if CONTROL_CHARS.search(value):
+        raise ValueError("Control characters are not supported in XML 1.0")
+    return f"<{name}{attr_text}>{escape(value)}</{name}>"
+
+
+def guid(channel_name, message_id, revision=None):
+    if revision:
+        return f"telegram_{channel_name}_{message_id}_{revision}"
+    return f"telegram_{channel_name}_{message_id}"
+
+
+# (format, feed, channel, id) -> (record, fragment); a changed record is serialized again
+class FragmentCache:
+    def __init__(self, size=FRAGMENT_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, record, render):
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == record:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        fragment = render(record)
+        self.entries[key] = (record, fragment)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        self.misses += 1
+        return fragment
+
+
+fragment_cache = FragmentCache()
+
+
+# head(), item(record) for every record, tail()
+class FeedWriter:
+    format = None
+    suffix = None
+
+    def __init__(self, channel_config, updated, feed_url=None, links=(), archive=False):
+        self.channel_name = channel_config['name']
+        self.title = channel_config.get('title', f"Channel @{self.channel_name}")
+        self.link = channel_config.get('link', f"https://t.me/{self.channel_name}")
+        self.description = channel_config.get('description', f"RSS of @{self.channel_name}")
+        self.language = 'ru'
+        self.updated = updated
+        self.feed_url = feed_url
+        self.links = links
+        self.archive = archive
+
+    def source(self, record):
+        return record[5] if len(record) > 5 and record[5] else self.channel_name
+
+    # when the item last changed
+    def modified(self, record):
+        return record[6] if len(record) > 6 and record[6] else record[4]
+
+    def guid(self, record):
+        return guid(self.source(record), record[0], record[7] if len(record) > 7 else None)
+
+    def item(self, record):
+        return fragment_cache.get((self.format, self.channel_name, self.source(record), record[0]), record, self.render_item)
+
+
+# rss 2.0; links: (rel, href) pairs as atom:link, archive: RFC 5005 archive page
+class RssWriter(FeedWriter):
+    format = 'rss'
+    suffix = '.xml'
+
+    def head(self):
+        namespaces = f' xmlns:atom="{ATOM_NS}"'
+        if self.archive:
+            namespaces += f' xmlns:fh="{FEED_HISTORY_NS}"'
+
+        parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n',
+            f'<rss version="2.0"{namespaces}><channel>',
+            element('title', self.title),
+            element('link', iri_to_uri(self.link)),
+            element('description', self.description),
+            element('language', self.language),
+            element('lastBuildDate', format_datetime(self.updated)),
+        ]
+        for rel, href in self.links:
+            parts.append(element('atom:link', None, {'href': href, 'rel': rel, 'type': 'application/rss+xml'}))
+        if self.archive:
+            parts.append(element('fh:archive', None))
+        return ''.join(parts)
+
+    def render_item(self, record):
+        message_id, title, text, link, pub_date = record[:5]
+        return (
+            "<item>"
+            + element('title', title)
+            + element('link', iri_to_uri(link))
+            + element('description', text)
+            + element('pubDate', format_datetime(pub_date))
+            + element('guid', self.guid(record), {'isPermaLink': 'false'})
+            + "</item>"
+        )
+
+    def tail(self):
+        return "</channel></rss>"
+
+
+class AtomWriter(FeedWriter):
+    format = 'atom'
+    suffix = '.atom'
+
+    def head(self):
+        parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n',
+            f'<feed xmlns="{ATOM_NS}" xml:lang="{self.language}">',
+            element('title', self.title),
+            element('link', None, {'href': iri_to_uri(self.link), 'rel': 'alternate'}),
+        ]
+        if self.feed_url:
+            parts.append(element('link', None, {'href': self.feed_url, 'rel': 'self'}))
+        parts += [
+            element('id', iri_to_uri(self.link)),
+            element('updated', self.updated.isoformat()),
+            element('subtitle', self.description),
+        ]
+        return ''.join(parts)
+
+    def render_item(self, record):
+        message_id, title, text, link, pub_date = record[:5]
+        return (
+            "<entry>"
+            + element('title', title)
+            + element('link', None, {'href': iri_to_uri(link), 'rel': 'alternate'})
+            + element('id', iri_to_uri(link))
+            + element('published', pub_date.isoformat())
+            + element('updated', self.modified(record).isoformat())
+            + element('content', text, {'type': 'text'})
+            + "</entry>"
+        )
+
+    def tail(self):
+        return "</feed>"
+
+
+# json feed 1.1, items separated by ", "
+class JsonFeedWriter(FeedWriter):
+    format = 'json'
+    suffix = '.json'
+
+    def head(self):
+        self.first = True
+        meta = {
+            'version': JSON_FEED_VERSION,
+            'title': self.title,
+            'home_page_url': self.link,
+            'description': self.description,
+            'language': self.language,
+        }
+        if self.feed_url:
+            meta['feed_url'] = self.feed_url
+        return json.dumps(meta, ensure_ascii=False)[:-1] + ', "items": ['
+
+    def item(self, record):
+        fragment = super().item(record)
+        if self.first:
+            self.first = False
+            return fragment
+        return ', ' + fragment
+
+    def render_item(self, record):
+        message_id, title, text, link, pub_date = record[:5]
+        item = {
+            'id': self.guid(record),
+            'url': link,
+            'title': title,
+            'content_text': text,
+            'date_published': pub_date.isoformat()
+        }
+        if len(record) > 6 and record[6]:
+            item['date_modified'] = record[6].isoformat()
+        return json.dumps(item, ensure_ascii=False)
+
+    def tail(self):
+        return ']}'
+
+
+WRITERS = {
+    'rss': RssWriter,
+    'atom': AtomWriter,
+    'json': JsonFeedWriter,
+}
+
+
+# like feedgenerator: newest pub_date (or edit) of the items, now for an empty feed
+def latest_date(records):
+    return max((r[6] if len(r) > 6 and r[6] else r[4] for r in records), default=None) or datetime.now(timezone.utc)
+
+
+# whole feed as one string (feed server, tests)
+def render_feed(fmt, channel_config, records, updated=None, feed_url=None, links=(), archive=False):
+    records = list(records)
+    writer = WRITERS[fmt](channel_config, updated or latest_date(records), feed_url, links, archive)
+    return writer.head() + ''.join(writer.item(r) for r in records) + writer.tail()
+
+
+# every format in one pass over records, written to <base_path><suffix>.tmp and renamed when
+# complete. records may be a generator; `updated` is needed up front then.
+# feed_urls: format -> public url; links go to the rss feed only. returns format -> path
+def write_feeds(base_path, formats, channel_config, records, updated=None, feed_urls=None, links=(), archive=False):
+    if updated is None:
+        records = list(records)
+        updated = latest_date(records)
+    feed_urls = feed_urls or {}
+
+    writers = []
+    try:
+        for fmt in formats:
+            writer = WRITERS[fmt](channel_config, updated, feed_urls.get(fmt), links if fmt == 'rss' else (), archive)
+            path = f"{base_path}{writer.suffix}"
+            f = open(f"{path}.tmp", 'w', encoding='utf-8')
+            writers.append((writer, path, f))
+            f.write(writer.head())
+
+        for record in records:
+            for writer, path, f in writers:
+                f.write(writer.item(record))
+
+        for writer, path, f in writers:
+            f.write(writer.tail())
+    except Exception:
+        for writer, path, f in writers:
+            f.close()
+            os.remove(f"{path}.tmp")
+        raise
+    finally:
+        for writer, path, f in writers:
+            f.close()
+
+    paths = {}
+    for writer, path, f in writers:
+        os.replace(f"{path}.tmp", path)
+        paths[writer.format] = path
+    return paths
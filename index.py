@@ -3,21 +3,27 @@ from datetime import datetime, timezone, timedelta
 import os
 
 
-def build_html_page():
-    settings_file = 'list.json'
-    destination_dir = 'gh-pages'
-    
-    with open(settings_file, 'r', encoding='utf-8') as config_data:
-        registry = json.load(config_data)
-
+def current_timestamp():
     tz_offset = timezone(timedelta(hours=3))
-    timestamp_str = datetime.now(tz_offset).strftime('%Y-%m-%d %H:%M:%S UTC')
+    return datetime.now(tz_offset).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+# list.json contents -> index page html (also served from memory by feed_server.py)
+def render_html_page(registry, timestamp_str=None):
+    if timestamp_str is None:
+        timestamp_str = current_timestamp()
     
     entries_markup = ""
     for entry in registry['channels']:
         feed_name = entry['name']
         feed_label = entry['title']
         entries_markup += f'                  <li><a href="{feed_name}.xml">{feed_label}</a></li>\n'
+
+    # cross-channel feeds (update.py aggregate_feed setting, "filtered_feeds")
+    aggregate_feed = registry.get('settings', {}).get('aggregate_feed', 'all')
+    combined = [{'name': aggregate_feed, 'title': 'All channels'}] if aggregate_feed else []
+    for entry in combined + registry.get('filtered_feeds', []):
+        entries_markup += f'                  <li><a href="{entry["name"]}.xml">{entry.get("title", entry["name"])}</a></li>\n'
     
     page_html = f"""<!DOCTYPE html>
 <html lang="ru">
@@ -125,6 +131,36 @@ def build_html_page():
             color: #667eea;
             font-size: 1.1em;
         }}
+        .search {{
+            margin-top: 40px;
+        }}
+        .search input {{
+            width: 100%;
+            padding: 12px 16px;
+            border: 2px solid #e9ecef;
+            border-radius: 8px;
+            font-size: 1em;
+            margin-bottom: 16px;
+        }}
+        .search input:focus {{
+            outline: none;
+            border-color: #667eea;
+        }}
+        .search ul {{
+            display: block;
+        }}
+        .search li {{
+            display: block;
+            margin-bottom: 10px;
+        }}
+        .search li::before {{
+            content: none;
+        }}
+        .search .meta {{
+            color: #6c757d;
+            font-size: 0.8em;
+            margin-top: 4px;
+        }}
     </style>
 </head>
 <body>
@@ -143,11 +179,103 @@ def build_html_page():
             </h2>
             <ul>
 {entries_markup}            </ul>
+
+            <div class="search">
+                <h2>Search</h2>
+                <input id="query" type="search" placeholder="CVE-2025, ransomware, фишинг..." autocomplete="off">
+                <ul id="results"></ul>
+            </div>
         </div>
     </div>
+    <script>
+        // static index written by search_index.py, see the layout there
+        const LIMIT = 30;
+        const cache = {{}};
+
+        function fetchJson(path) {{
+            if (!(path in cache)) {{
+                cache[path] = fetch(path).then(r => r.ok ? r.json() : {{}}).catch(() => ({{}}));
+            }}
+            return cache[path];
+        }}
+
+        function words(query) {{
+            return (query.toLowerCase().replace(/ё/g, 'е').match(/[\\p{{L}}\\p{{N}}_]+/gu) || []).filter(w => w.length >= 2);
+        }}
+
+        // doc numbers of one segment where every word matches (as prefix; two letters: exact)
+        async function searchSegment(meta, segment, queryWords) {{
+            let result = null;
+            for (const word of queryWords) {{
+                const shard = encodeURIComponent(word.slice(0, meta.shard_chars));
+                const postings = await fetchJson('search/terms/' + segment + '/' + shard + '.json');
+                const found = new Set();
+                for (const [token, docs] of Object.entries(postings)) {{
+                    if (word.length < meta.shard_chars ? token === word : token.startsWith(word)) {{
+                        docs.forEach(n => found.add(n));
+                    }}
+                }}
+                result = result === null ? found : new Set([...result].filter(n => found.has(n)));
+                if (!result.size) break;
+            }}
+            return [...(result || [])].sort((a, b) => b - a);
+        }}
+
+        // newest segment first, older ones only while there are too few hits
+        async function search(query) {{
+            const meta = await fetchJson('search/meta.json');
+            const queryWords = words(query);
+            if (!meta.docs || !queryWords.length) return [];
+
+            let numbers = [];
+            for (let segment = Math.floor((meta.docs - 1) / meta.docs_per_segment); segment >= 0 && numbers.length < LIMIT; segment--) {{
+                numbers = numbers.concat(await searchSegment(meta, segment, queryWords));
+            }}
+            return Promise.all(numbers.slice(0, LIMIT).map(async n =>
+                (await fetchJson('search/docs/' + Math.floor(n / meta.docs_per_block) + '.json'))[n]
+            ));
+        }}
+
+        const input = document.getElementById('query');
+        const results = document.getElementById('results');
+        let timer = null;
+
+        input.addEventListener('input', () => {{
+            clearTimeout(timer);
+            timer = setTimeout(async () => {{
+                const query = input.value;
+                const hits = await search(query);
+                if (query !== input.value) return;
+
+                results.replaceChildren(...hits.filter(Boolean).map(([channel, id, title, link, pubDate]) => {{
+                    const item = document.createElement('li');
+                    const anchor = document.createElement('a');
+                    anchor.href = link;
+                    anchor.textContent = title;
+                    const meta = document.createElement('div');
+                    meta.className = 'meta';
+                    meta.textContent = pubDate.slice(0, 10) + ' · @' + channel;
+                    item.append(anchor, meta);
+                    return item;
+                }}));
+            }}, 250);
+        }});
+    </script>
 </body>
 </html>
 """
+    return page_html
+
+
+def build_html_page():
+    settings_file = 'list.json'
+    destination_dir = 'gh-pages'
+    
+    with open(settings_file, 'r', encoding='utf-8') as config_data:
+        registry = json.load(config_data)
+
+    timestamp_str = current_timestamp()
+    page_html = render_html_page(registry, timestamp_str)
     
     os.makedirs(destination_dir, exist_ok=True)
     
@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# defanged forms analysts use so links don't go live: hxxp://, example[.]com, 1.2.3[.]4, host[:]443
+DEFANGED = re.compile(r'hxxp|\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)|\[:\]|\[://\]', re.IGNORECASE)
+REFANG = {'hxxp': 'http', '[.]': '.', '(.)': '.', '{.}': '.', '[dot]': '.', '(dot)': '.', '[:]': ':', '[://]': '://'}
+
+# one pass: the first alternative that matches at a position wins, urls before the hosts inside them
+INDICATOR_PATTERN = re.compile(r'''
+    (?P<url>\bhttps?://[^\s<>"'`\[\]{}|\\^]+)
+  | (?P<cve>\bCVE-\d{4}-\d{4,7}\b)
+  | (?P<sha256>\b[0-9a-f]{64}\b)
+  | (?P<sha1>\b[0-9a-f]{40}\b)
+  | (?P<md5>\b[0-9a-f]{32}\b)
+  | (?P<ipv4>(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\b(?!\.\d))
+  | (?P<domain>\b(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24}\b(?![.-]?\w))
+''', re.IGNORECASE | re.VERBOSE)
+
+# bare hosts only with a common tld: "file.exe", "obj.path" and "15.10.2025.zip" are not hosts.
+# hosts of explicit urls are taken whatever their tld
+TLDS = frozenset((
+    'com net org info biz io co me xyz top online site app dev cloud pro tech space website live shop '
+    'store club icu buzz fun link click work support services host name mobi asia tel today world news '
+    'ru su ua by kz uz am ge az kg md tj tm lt lv ee pl cz sk hu ro bg rs hr si ba mk al gr cy tr il ir '
+    'iq sa ae qa kw om pk in bd lk cn hk tw jp kr vn th my sg id ph au nz ca us mx br ar cl pe ve uk '
+    'de fr nl be lu ch at it es pt ie is no se fi dk eu ng za eg ma ke tk ml ga cf gq cc tv ws to gg'
+).split())
+
+# links every post has
+IGNORED_DOMAINS = frozenset(('t.me', 'telegram.me', 'telegram.org', 'telesco.pe', 'cdn-telegram.org'))
+
+URL_TRAILING = '.,;:!?)\'"»'
+
+
+def refang(text):
+    if not DEFANGED.search(text):
+        return text
+    return DEFANGED.sub(lambda m: REFANG[m.group().lower()], text)
+
+
+def host_of(url):
+    host = url.split('://', 1)[1].split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+    return host.rsplit('@', 1)[-1].split(':', 1)[0].lower().rstrip('.')
+
+
+def ignored(host):
+    return host in IGNORED_DOMAINS or any(host.endswith('.' + d) for d in IGNORED_DOMAINS)
+
+
+# text -> {"type:value"}, values normalized (cve upper, hashes and hosts lower)
+def extract_indicators(text):
+    found = set()
+    if not text:
+        return found
+
+    for match in INDICATOR_PATTERN.finditer(refang(text)):
+        kind = match.lastgroup
+        value = match.group()
+
+        if kind == 'url':
+            value = value.rstrip(URL_TRAILING)
+            host = host_of(value)
+            # localhost, "http://IP/..." placeholders
+            if '.' not in host or ignored(host):
+                continue
+            found.add(f"url:{value}")
+            host_match = INDICATOR_PATTERN.fullmatch(host)
+            if host_match is not None and host_match.lastgroup == 'ipv4':
+                found.add(f"ipv4:{host}")
+            else:
+                found.add(f"domain:{host}")
+        elif kind == 'cve':
+            found.add(f"cve:{value.upper()}")
+        elif kind == 'domain':
+            value = value.lower()
+            if value.rsplit('.', 1)[-1] in TLDS and not ignored(value):
+                found.add(f"domain:{value}")
+        else:
+            found.add(f"{kind}:{value.lower()}")
+
+    return found
+
+
+# file name of an indicator under <out_dir>/<type>/; urls (and anything odd) by digest
+def indicator_path(out_dir, key):
+    kind, value = key.split(':', 1)
+    if kind == 'url' or not re.fullmatch(r'[A-Za-z0-9.-]+', value):
+        value = hashlib.sha1(value.encode('utf-8')).hexdigest()
+    return os.path.join(out_dir, kind, f"{value}.json")
+
+
+# indicator -> message ids of one channel, kept in channel_data/.<name>_indicators
+class IndicatorIndex:
+    def __init__(self, path):
+        self.path = path
+        self.exists = os.path.exists(path)
+        self.index = {}  # "type:value" -> set of ids
+        self.messages = {}  # id -> set of "type:value"
+
+        if self.exists:
+            with open(path, 'r', encoding='utf-8') as f:
+                for key, ids in json.load(f).items():
+                    self.index[key] = set(ids)
+                    for message_id in ids:
+                        self.messages.setdefault(message_id, set()).add(key)
+
+    # returns (added, removed): "type:value" -> ids
+    def update(self, messages):
+        added, removed = {}, {}
+        for message in messages:
+            message_id = message['id']
+            new = extract_indicators(message['text'])
+            old = self.messages.get(message_id, set())
+
+            for key in new - old:
+                self.index.setdefault(key, set()).add(message_id)
+                added.setdefault(key, set()).add(message_id)
+            for key in old - new:
+                self.index[key].discard(message_id)
+                if not self.index[key]:
+                    del self.index[key]
+                removed.setdefault(key, set()).add(message_id)
+
+            if new:
+                self.messages[message_id] = new
+            else:
+                self.messages.pop(message_id, None)
+
+        return added, removed
+
+    def save(self):
+        data = {key: sorted(ids, key=lambda i: int(i) if i.isdigit() else 0) for key, ids in sorted(self.index.items())}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self.exists = True
+
+
+# <out_dir>/<type>/<value>.json: every sighting of one indicator, newest first.
+# only files of indicators touched by this run are read and rewritten
+def publish_indicators(out_dir, channel_name, added, removed, messages):
+    written = 0
+    for key in set(added) | set(removed):
+        path = indicator_path(out_dir, key)
+        kind, value = key.split(':', 1)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {'type': kind, 'value': value, 'sightings': []}
+
+        gone = removed.get(key, set()) | added.get(key, set())
+        sightings = [
+            s for s in data['sightings']
+            if not (s['channel'] == channel_name and s['id'] in gone)
+        ]
+        for message_id in added.get(key, ()):
+            message = messages[message_id]
+            sightings.append({
+                'channel': channel_name,
+                'id': message_id,
+                'title': message['title'],
+                'link': message['link'],
+                'pub_date': message['pub_date'].isoformat()
+            })
+
+        if not sightings:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+
+        data['sightings'] = sorted(sightings, key=lambda s: s['pub_date'], reverse=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        written += 1
+
+    return written
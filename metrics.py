@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# prometheus metric names
+PREFIX = 'tgrss'
+
+
+# stage timings and counters for one run, booked per channel from worker threads
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.run = {'stages': {}, 'counters': {}}  # work outside any channel (sleep, pools)
+        self.channels = {}  # name -> {'stages': {}, 'counters': {}}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    # stages and counts on this thread go to channel_name
+    @contextmanager
+    def channel(self, channel_name):
+        previous = getattr(self.local, 'channel', None)
+        self.local.channel = channel_name
+        try:
+            yield
+        finally:
+            self.local.channel = previous
+
+    def target(self):
+        channel_name = getattr(self.local, 'channel', None)
+        if channel_name is None:
+            return self.run
+        if channel_name not in self.channels:
+            self.channels[channel_name] = {'stages': {}, 'counters': {}}
+        return self.channels[channel_name]
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            stages = self.target()['stages']
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            counters = self.target()['counters']
+            counters[name] = counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    # results: process_channel() dicts
+    def report(self, results=()):
+        if self.finished is None:
+            self.finished = time.time()
+
+        totals = {'stages': {}, 'counters': {}}
+        for entry in [self.run] + list(self.channels.values()):
+            for kind in ('stages', 'counters'):
+                for name, value in entry[kind].items():
+                    totals[kind][name] = totals[kind].get(name, 0) + value
+
+        channels = {}
+        for result in results:
+            entry = self.channels.get(result['channel'], {'stages': {}, 'counters': {}})
+            channels[result['channel']] = dict(
+                {k: v for k, v in result.items() if k != 'channel'},
+                stages=round_stages(entry['stages']),
+                counters=dict(entry['counters'])
+            )
+
+        slowest = sorted(channels, key=lambda c: channels[c].get('elapsed', 0), reverse=True)
+
+        return {
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'finished': datetime.fromtimestamp(self.finished, timezone.utc).isoformat(),
+            'elapsed': round(self.finished - self.started, 3),
+            'stages': round_stages(totals['stages']),
+            'counters': totals['counters'],
+            'run_stages': round_stages(self.run['stages']),
+            'slowest': slowest[:5],
+            'channels': channels
+        }
+
+
+def round_stages(stages):
+    return {name: round(seconds, 4) for name, seconds in sorted(stages.items())}
+
+
+# readers (node_exporter, the workflow) never see half a file
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_json_report(path, report):
+    write_atomic(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# node_exporter textfile collector format
+def prometheus_text(report):
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+            lines.append(f"{PREFIX}_{name}{{{label_text}}} {value}" if labels else f"{PREFIX}_{name} {value}")
+
+    finished = datetime.fromisoformat(report['finished']).timestamp()
+    metric('run_finished_timestamp_seconds', 'Unix time the last run finished', [({}, round(finished, 3))])
+    metric('run_seconds', 'Wall time of the last run', [({}, report['elapsed'])])
+    metric('run_stage_seconds', 'Time per stage summed over channels', [
+        ({'stage': stage}, seconds) for stage, seconds in report['stages'].items()
+    ])
+    metric('run_channels', 'Channels per result status', [
+        ({'status': status}, count)
+        for status, count in sorted(Counter(c['status'] for c in report['channels'].values()).items())
+    ])
+
+    channels = report['channels']
+    metric('channel_seconds', 'Wall time per channel', [
+        ({'channel': name}, c.get('elapsed', 0)) for name, c in channels.items()
+    ])
+    metric('channel_stage_seconds', 'Time per channel and stage', [
+        ({'channel': name, 'stage': stage}, seconds)
+        for name, c in channels.items() for stage, seconds in c['stages'].items()
+    ])
+    metric('channel_up', 'Channel updated (ok or unchanged)', [
+        ({'channel': name}, int(c['status'] in ('ok', 'unchanged'))) for name, c in channels.items()
+    ])
+
+    counters = sorted({counter for c in channels.values() for counter in c['counters']})
+    for counter in counters:
+        metric(f"channel_{counter}", f"{counter.replace('_', ' ')} per channel", [
+            ({'channel': name}, c['counters'].get(counter, 0)) for name, c in channels.items()
+        ])
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, report):
+    write_atomic(path, prometheus_text(report))
+
+
+# stacks of all other threads every `interval`, folded for flamegraph.pl / speedscope
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.running = False
+        self.thread = None
+
+    def sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def loop(self):
+        while self.running:
+            self.sample()
+            time.sleep(self.interval)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def write(self, path):
+        write_atomic(path, ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+
+# mode: None, 'cprofile' (calling thread only, so serial runs) or 'sample' (all threads)
+@contextmanager
+def profile_run(mode, out_dir):
+    if not mode:
+        yield
+        return
+
+    if mode == 'cprofile':
+        import pstats
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(out_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(out_dir, 'profile.prof'))
+            with open(os.path.join(out_dir, 'profile.txt'), 'w', encoding='utf-8') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+    elif mode == 'sample':
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            profiler.write(os.path.join(out_dir, 'profile.folded'))
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}")
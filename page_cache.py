@@ -0,0 +1,143 @@
+import os
+import gzip
+import threading
+import logging
+from datetime import datetime, timezone, timedelta
+from tme_parser import page_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# raw t.me pages as fetched, for re-parsing without the network (update.py replay):
+#   <root>/blobs/<ab>/<fingerprint>.html.gz   gzipped page, named by page_fingerprint()
+#   <root>/pages/<channel>                     <fetched>\t<fingerprint>\t<url>, a line per snapshot
+# the fingerprint ignores views and reactions, so a page fetched again with the same posts
+# is stored once. evict() drops snapshots past the ttl, then the oldest until the blobs fit
+
+
+class PageCache:
+    def __init__(self, root='cache/pages', max_days=30, max_bytes=256 << 20):
+        self.root = root
+        self.max_days = max_days
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.seen = {}  # channel -> {(fingerprint, url)} already in its index
+
+    def blob_path(self, fingerprint):
+        return os.path.join(self.root, 'blobs', fingerprint[:2], f"{fingerprint}.html.gz")
+
+    def index_path(self, channel_name):
+        return os.path.join(self.root, 'pages', channel_name)
+
+    def snapshots(self, channel_name):
+        try:
+            with open(self.index_path(channel_name), 'r', encoding='utf-8') as f:
+                lines = [line.rstrip('\n').split('\t') for line in f]
+        except FileNotFoundError:
+            return []
+        # (fetched, fingerprint, url), torn lines skipped
+        return [tuple(parts) for parts in lines if len(parts) == 3]
+
+    def channels(self):
+        try:
+            return sorted(os.listdir(os.path.join(self.root, 'pages')))
+        except FileNotFoundError:
+            return []
+
+    # blob first, then the index line: a line never points at a missing page
+    def store(self, channel_name, url, content, fingerprint=None):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        fingerprint = fingerprint or page_fingerprint(content)
+
+        path = self.blob_path(fingerprint)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(gzip.compress(content, mtime=0))
+            os.replace(tmp, path)
+
+        with self.lock:
+            if channel_name not in self.seen:
+                self.seen[channel_name] = {(s[1], s[2]) for s in self.snapshots(channel_name)}
+            if (fingerprint, url) in self.seen[channel_name]:
+                return False
+            self.seen[channel_name].add((fingerprint, url))
+
+            os.makedirs(os.path.dirname(self.index_path(channel_name)), exist_ok=True)
+            with open(self.index_path(channel_name), 'a', encoding='utf-8') as f:
+                f.write(f"{datetime.now(timezone.utc).isoformat()}\t{fingerprint}\t{url}\n")
+        return True
+
+    def read(self, fingerprint):
+        with open(self.blob_path(fingerprint), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    # every distinct page of a channel once, oldest snapshot first, so later pages win on replay
+    def pages(self, channel_name):
+        latest = {}
+        for fetched, fingerprint, url in self.snapshots(channel_name):
+            latest[fingerprint] = max(latest.get(fingerprint, ''), fetched)
+        return sorted(latest, key=latest.get)
+
+    # ttl, then size; returns (snapshots dropped, blobs deleted)
+    def evict(self):
+        with self.lock:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=self.max_days)).isoformat() if self.max_days else ''
+            indexes = {}
+            dropped = 0
+            for channel_name in self.channels():
+                snapshots = self.snapshots(channel_name)
+                kept = [s for s in snapshots if s[0] >= cutoff]
+                dropped += len(snapshots) - len(kept)
+                indexes[channel_name] = kept
+
+            sizes = {}
+            for directory, _, names in os.walk(os.path.join(self.root, 'blobs')):
+                for name in names:
+                    if name.endswith('.html.gz'):
+                        sizes[name[:-len('.html.gz')]] = os.path.getsize(os.path.join(directory, name))
+
+            references = {}
+            for snapshots in indexes.values():
+                for _, fingerprint, _ in snapshots:
+                    references[fingerprint] = references.get(fingerprint, 0) + 1
+
+            # oldest snapshots out until the pages still referenced fit
+            total = sum(sizes.get(fingerprint, 0) for fingerprint in references)
+            if self.max_bytes and total > self.max_bytes:
+                oldest = sorted((s[0], channel_name, s) for channel_name, snapshots in indexes.items() for s in snapshots)
+                gone = set()
+                for _, channel_name, snapshot in oldest:
+                    if total <= self.max_bytes:
+                        break
+                    gone.add((channel_name, snapshot))
+                    references[snapshot[1]] -= 1
+                    if not references[snapshot[1]]:
+                        total -= sizes.get(snapshot[1], 0)
+                for channel_name in indexes:
+                    kept = [s for s in indexes[channel_name] if (channel_name, s) not in gone]
+                    dropped += len(indexes[channel_name]) - len(kept)
+                    indexes[channel_name] = kept
+
+            for channel_name, snapshots in indexes.items():
+                path = self.index_path(channel_name)
+                tmp = f"{path}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.writelines(f"{fetched}\t{fingerprint}\t{url}\n" for fetched, fingerprint, url in snapshots)
+                os.replace(tmp, path)
+            self.seen.clear()
+
+            live = {fingerprint for snapshots in indexes.values() for _, fingerprint, _ in snapshots}
+            deleted = 0
+            for fingerprint in sizes:
+                if fingerprint not in live:
+                    path = self.blob_path(fingerprint)
+                    os.remove(path)
+                    deleted += 1
+                    if not os.listdir(os.path.dirname(path)):
+                        os.rmdir(os.path.dirname(path))
+
+        if dropped or deleted:
+            logger.info(f"✓ Page cache: {dropped} snapshots dropped, {deleted} pages deleted")
+        return dropped, deleted
@@ -0,0 +1,113 @@
+import re
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# characters [A-Za-z0-9/+=] matched under IGNORECASE (unicode folding adds İ ı ſ and the kelvin sign),
+# spelled out so the 40-char scan runs without case folding
+_B64 = 'A-Za-z0-9/+=\u0130\u0131\u017f\u212a'
+_B64_NO_EQ = 'A-Za-z0-9/+\u0130\u0131\u017f\u212a'
+
+# same folding for the literal triggers below (lower() already maps the kelvin sign)
+_FOLD = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+# name, pattern, flags, lowercase literals one of which every match contains
+# (None = checked in code). order matters: every pattern runs over the output of the previous ones.
+# 40 hex digits are a sha1 (indicators.py needs them), not an aws secret
+SECRET_PATTERNS = [
+    ('AWS_ACCESS_KEY', r'AKIA[0-9A-Z]{16}', re.IGNORECASE, ('akia',)),
+    ('AWS_SECRET', rf'(?<![{_B64_NO_EQ}])(?![0-9a-fA-F]{{40}}(?![{_B64}]))(?:[{_B64}]{{40}})(?![{_B64}])', 0, None),
+    ('PRIVATE_KEY', r'-----BEGIN [A-Z ]*KEY.*?-----END [A-Z ]*KEY.*?-----', re.IGNORECASE, ('-----begin ',)),
+    ('TELEGRAM_BOT_TOKEN', r'\d{8,12}:[A-Za-z0-9_-]{25,}', re.IGNORECASE, None),
+    ('JWT_TOKEN', r'eyJ[A-Za-z0-9_-]+\.(?:[A-Za-z0-9_-]+\.)?[A-Za-z0-9_-]+', re.IGNORECASE, ('eyj',)),
+    ('STRIPE_KEY', r'(?:sk|pk)_(?:live|test)_[A-Za-z0-9]{20,}', re.IGNORECASE, ('k_live_', 'k_test_')),
+    ('MONGODB_URI', r'mongodb\+srv://[^\s:]+:[^\s@]+@', re.IGNORECASE, ('mongodb+srv://',)),
+    ('DATABASE_URL', r'(?:postgres|mysql|sqlite)://[^\s:]+:[^\s@]+@', re.IGNORECASE, ('postgres://', 'mysql://', 'sqlite://')),
+]
+
+
+# compiled once; a cheap pass over the message picks the patterns worth running
+class SecretSanitizer:
+    def __init__(self, patterns=SECRET_PATTERNS):
+        self.patterns = [
+            (name, re.compile(pattern, re.DOTALL | flags), f'[REDACTED_{name}]', literals)
+            for name, pattern, flags, literals in patterns
+        ]
+
+    # 40 base64 chars in a row need a 40+ char token without whitespace
+    def has_long_token(self, text):
+        return any(len(token) >= 40 for token in text.split())
+
+    # 8+ digits right before a colon
+    def has_bot_token_prefix(self, text):
+        pos = text.find(':', 8)
+        while pos != -1:
+            if text[pos - 8:pos].isdecimal():
+                return True
+            pos = text.find(':', pos + 1)
+        return False
+
+    def candidates(self, text):
+        folded = text.lower()
+        if '\u0130' in text or '\u0131' in text or '\u017f' in text:
+            folded = text.translate(_FOLD).lower()
+
+        for name, pattern, replacement, literals in self.patterns:
+            if literals is not None:
+                if any(literal in folded for literal in literals):
+                    yield name, pattern, replacement
+            elif name == 'AWS_SECRET':
+                if self.has_long_token(text):
+                    yield name, pattern, replacement
+            elif self.has_bot_token_prefix(text):
+                yield name, pattern, replacement
+
+    # returns (text, {pattern_name: count})
+    def sanitize(self, text):
+        redactions = {}
+        if not text:
+            return text, redactions
+
+        for name, pattern, replacement in list(self.candidates(text)):
+            matches = list(pattern.finditer(text))
+            if not matches:
+                continue
+
+            # each value replaced at its own position -> one pass with sub()
+            if all(text.find(m.group()) == m.start() for m in matches):
+                text = pattern.sub(replacement, text)
+            else:
+                # same value seen earlier in the text: keep replace-first semantics
+                for match in matches:
+                    text = text.replace(match.group(), replacement, 1)
+
+            redactions[name] = len(matches)
+
+        return text, redactions
+
+
+default_sanitizer = SecretSanitizer()
+
+# per-thread totals, read around a parse for the run metrics
+_stats = threading.local()
+
+
+# (seconds spent, values redacted) on this thread so far
+def sanitize_stats():
+    return getattr(_stats, 'seconds', 0.0), getattr(_stats, 'redactions', 0)
+
+
+def sanitize_sensitive_data(text, channel_name=""):
+    started = time.perf_counter()
+    text, redactions = default_sanitizer.sanitize(text)
+    _stats.seconds = getattr(_stats, 'seconds', 0.0) + time.perf_counter() - started
+    _stats.redactions = getattr(_stats, 'redactions', 0) + sum(redactions.values())
+
+    # logs
+    if redactions:
+        redaction_list = ', '.join([f"{k}({v})" for k, v in redactions.items()])
+        logger.warning(f"!!! {channel_name}: Redacted sensitive data - {redaction_list}")
+
+    return text
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import random
+import logging
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+# posts per day over the last window_days of archived pub_dates
+def posting_rate(pub_dates, window_days=30, now=None):
+    now = now or datetime.now(timezone.utc)
+    dates = list(pub_dates)
+    if not dates:
+        return 0.0
+
+    window_start = now - timedelta(days=window_days)
+    recent = [d for d in dates if d >= window_start]
+    if not recent:
+        return 0.0
+
+    # archive may not reach back a whole window (young channel, retention)
+    span = now - max(window_start, min(dates))
+    days = max(span.total_seconds() / 86400, 1 / 24)
+    return len(recent) / days
+
+
+# poll state per channel + global poll budget, kept in one json file between runs
+class PollScheduler:
+    def __init__(self, settings):
+        self.path = settings['schedule_path']
+        self.min_interval = settings['schedule_min_interval']
+        self.max_interval = settings['schedule_max_interval']
+        self.jitter = settings['schedule_jitter']
+        self.backoff = settings['schedule_backoff']
+        self.budget = settings['schedule_budget']
+        self.state = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault('channels', {})
+        state.setdefault('budget', {'tokens': self.budget, 'updated': time.time()})
+        return state
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    # about one new post per poll, slower after every empty poll
+    def interval(self, rate, quiet):
+        if rate and rate > 0:
+            seconds = 86400 / rate
+        else:
+            seconds = self.max_interval
+        seconds *= self.backoff ** quiet
+        seconds = min(max(seconds, self.min_interval), self.max_interval)
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # polls allowed right now (token bucket refilled by budget per hour)
+    def available(self, now):
+        if not self.budget:
+            return None
+        budget = self.state['budget']
+        tokens = budget['tokens'] + (now - budget['updated']) * self.budget / 3600
+        budget['tokens'] = min(tokens, self.budget)
+        budget['updated'] = now
+        return int(budget['tokens'])
+
+    # due channels, most overdue first, cut to the budget.
+    # share (i, N): shard i of N gets its part of the polls, the merge charges them (see charge)
+    def due(self, channels, now=None, share=None):
+        now = now or time.time()
+        entries = self.state['channels']
+
+        due = [c for c in channels if entries.get(c['name'], {}).get('next_due', 0) <= now]
+        due.sort(key=lambda c: entries.get(c['name'], {}).get('next_due', 0))
+
+        available = self.available(now)
+        if available is not None:
+            if share is not None:
+                index, count = share
+                available = available // count + (index < available % count)
+            if len(due) > available:
+                logger.info(f"⏱ Budget: polling {available} of {len(due)} due channels")
+            due = due[:available]
+            self.state['budget']['tokens'] -= len(due)
+
+        return due
+
+    # polls made elsewhere (shards) taken from the bucket
+    def charge(self, polls, now=None):
+        if self.available(now or time.time()) is not None:
+            self.state['budget']['tokens'] -= polls
+
+    def record(self, results, now=None):
+        now = now or time.time()
+        for result in results:
+            entry = self.state['channels'].setdefault(result['channel'], {'quiet': 0, 'rate': None})
+
+            if result.get('posts_per_day') is not None:
+                entry['rate'] = result['posts_per_day']
+
+            if result['status'] == 'ok':
+                entry['quiet'] = 0
+            elif result['status'] == 'unchanged':
+                entry['quiet'] += 1
+
+            if result['status'] == 'error':
+                seconds = self.min_interval
+            else:
+                seconds = self.interval(entry['rate'], entry['quiet'])
+
+            entry['last_poll'] = round(now)
+            entry['next_due'] = round(now + seconds)
+
+    # seconds until the next channel is due (0 when one already is)
+    def next_due_in(self, channels, now=None):
+        now = now or time.time()
+        entries = self.state['channels']
+        next_due = min((entries.get(c['name'], {}).get('next_due', 0) for c in channels), default=now)
+        return max(next_due - now, 0)
@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# static full-text index, fetched piece by piece by the search box on index.html:
+#   <out_dir>/meta.json                            {"docs": count, ...layout constants}
+#   <out_dir>/terms/<n // 20000>/<first 3 chars>.json   token -> doc numbers, ascending
+#   <out_dir>/docs/<n // 1000>.json                doc number -> [channel, id, title, link, pub_date]
+# a query word matches every token it is a prefix of ("атак" -> атака, атаки, атаковали),
+# which stands in for stemming and works the same in python and the browser.
+# doc numbers grow with every new message, so a higher number is a newer post: new messages
+# only touch shards of the newest segment, and a search walks segments newest first and
+# stops once it has enough hits
+
+TOKEN = re.compile(r'\w+')
+MIN_TOKEN = 2
+MAX_TOKEN = 40
+SHARD_CHARS = 3
+DOCS_PER_SEGMENT = 20000
+DOCS_PER_BLOCK = 1000
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return {t for t in TOKEN.findall(normalize(text)) if MIN_TOKEN <= len(t) <= MAX_TOKEN}
+
+
+def shard_key(token):
+    return token[:SHARD_CHARS]
+
+
+def read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp, path)
+
+
+# (channel, id) -> doc number, one appended line per new doc in channel_data/.search_docs
+class SearchIndex:
+    def __init__(self, out_dir='rss_feeds/search', docs_path='channel_data/.search_docs'):
+        self.out_dir = out_dir
+        self.docs_path = docs_path
+        self.exists = os.path.exists(docs_path)
+        self.docs = {}
+
+        if self.exists:
+            with open(docs_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 3:
+                        self.docs[(parts[1], parts[2])] = int(parts[0])
+
+    def terms_path(self, segment, shard):
+        return os.path.join(self.out_dir, 'terms', str(segment), f"{shard}.json")
+
+    def docs_block_path(self, block):
+        return os.path.join(self.out_dir, 'docs', f"{block}.json")
+
+    # only the shards and doc blocks these messages touch are read and rewritten.
+    # an edited message keeps its number; tokens it lost stay in the index until a rebuild
+    def add(self, messages):
+        new_docs = []
+        terms = {}  # (segment, shard) -> token -> doc numbers
+        blocks = {}  # block -> doc number -> meta
+
+        for message in messages:
+            key = (message['channel'], message['id'])
+            number = self.docs.get(key)
+            if number is None:
+                number = len(self.docs)
+                self.docs[key] = number
+                new_docs.append(f"{number}\t{key[0]}\t{key[1]}\n")
+
+            for token in tokenize(f"{message['title']}\n{message['text']}"):
+                terms.setdefault((number // DOCS_PER_SEGMENT, shard_key(token)), {}).setdefault(token, set()).add(number)
+            blocks.setdefault(number // DOCS_PER_BLOCK, {})[str(number)] = [
+                message['channel'], message['id'], message['title'], message['link'], message['pub_date'].isoformat()
+            ]
+
+        for (segment, shard), tokens in terms.items():
+            path = self.terms_path(segment, shard)
+            postings = read_json(path, {})
+            for token, numbers in tokens.items():
+                postings[token] = sorted(set(postings.get(token, ())) | numbers)
+            write_json(path, postings)
+
+        for block, docs in blocks.items():
+            path = self.docs_block_path(block)
+            write_json(path, dict(read_json(path, {}), **docs))
+
+        write_json(os.path.join(self.out_dir, 'meta.json'), {
+            'docs': len(self.docs),
+            'shard_chars': SHARD_CHARS,
+            'docs_per_segment': DOCS_PER_SEGMENT,
+            'docs_per_block': DOCS_PER_BLOCK
+        })
+
+        os.makedirs(os.path.dirname(self.docs_path) or '.', exist_ok=True)
+        with open(self.docs_path, 'a', encoding='utf-8') as f:
+            f.writelines(new_docs)
+        self.exists = True
+
+        return len(new_docs), len(terms)
+
+    # doc numbers of one segment where every word matches
+    def search_segment(self, segment, words):
+        result = None
+        for word in words:
+            postings = read_json(self.terms_path(segment, shard_key(word)), {})
+            if len(word) < SHARD_CHARS:
+                numbers = set(postings.get(word, ()))
+            else:
+                numbers = set()
+                for token, docs in postings.items():
+                    if token.startswith(word):
+                        numbers.update(docs)
+            result = numbers if result is None else result & numbers
+            if not result:
+                return set()
+        return result
+
+    # every word must match (as prefix; two-letter words exactly), newest first
+    def search(self, query, limit=20):
+        words = [w for w in TOKEN.findall(normalize(query)) if len(w) >= MIN_TOKEN]
+        docs = read_json(os.path.join(self.out_dir, 'meta.json'), {}).get('docs', 0)
+        if not words or not docs:
+            return []
+
+        numbers = []
+        for segment in range((docs - 1) // DOCS_PER_SEGMENT, -1, -1):
+            numbers += sorted(self.search_segment(segment, words), reverse=True)
+            if len(numbers) >= limit:
+                break
+
+        hits = []
+        blocks = {}
+        for number in numbers[:limit]:
+            block = number // DOCS_PER_BLOCK
+            if block not in blocks:
+                blocks[block] = read_json(self.docs_block_path(block), {})
+            hits.append(blocks[block][str(number)])
+        return hits
+
+
+# python search_index.py <query> [index dir]
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python search_index.py <query> [index dir]")
+        return
+
+    index = SearchIndex(sys.argv[2] if len(sys.argv) > 2 else 'rss_feeds/search')
+    for channel_name, message_id, title, link, pub_date in index.search(sys.argv[1]):
+        print(f"{pub_date[:10]}  {channel_name:<20} {title}\n            {link}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+import os
+import json
+import mmap
+import threading
+import logging
+from datetime import datetime, timezone, timedelta
+from archive_common import JsonExport, run_command_line
+
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = ('id', 'title', 'text', 'link', 'pub_date')
+# only on edited messages / parsed since raw hashes were kept
+OPTIONAL_FIELDS = ('edited', 'raw_hash')
+
+# one line per record or tombstone, the last line for an id wins:
+#   <id>\t<segment>\t<offset>\t<length>\t<pub_date>
+#   <id>\t-
+INDEX_FILE = 'index'
+TOMBSTONE = '-'
+
+
+def segment_name(number):
+    return f"{number:06d}.ndjson"
+
+
+def stored_record(record):
+    stored = {field: record[field] for field in RECORD_FIELDS}
+    stored.update((field, record[field]) for field in OPTIONAL_FIELDS if record.get(field))
+    return stored
+
+
+def sort_key(entry):
+    message_id, (segment, offset, length, pub_date) = entry
+    return (pub_date, int(message_id) if message_id.isdigit() else -1)
+
+
+# message archive as append-only ndjson segments per channel:
+#   <root>/<channel>/000001.ndjson ...  records, one json object per line
+#   <root>/<channel>/index              id -> segment, offset, length, pub_date
+# new and edited records are appended, compact() rewrites live records into fresh segments
+class SegmentLog(JsonExport):
+    def __init__(self, root='channel_data/log', segment_size=1 << 20):
+        self.root = root
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        self.indexes = {}  # channel -> {id: (segment, offset, length, pub_date)}
+
+    def close(self):
+        with self.lock:
+            self.indexes.clear()
+
+    def channel_dir(self, channel_name):
+        return os.path.join(self.root, channel_name)
+
+    def segments(self, channel_name):
+        try:
+            names = os.listdir(self.channel_dir(channel_name))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name.split('.')[0]) for name in names if name.endswith('.ndjson'))
+
+    def index(self, channel_name):
+        index = self.indexes.get(channel_name)
+        if index is not None:
+            return index
+
+        index = {}
+        path = os.path.join(self.channel_dir(channel_name), INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 2 and parts[1] == TOMBSTONE:
+                        index.pop(parts[0], None)
+                    elif len(parts) == 5:
+                        index[parts[0]] = (int(parts[1]), int(parts[2]), int(parts[3]), parts[4])
+                    # anything else: line torn by a crash, the record is appended again next run
+
+        self.indexes[channel_name] = index
+        return index
+
+    def append_index(self, channel_name, lines):
+        with open(os.path.join(self.channel_dir(channel_name), INDEX_FILE), 'ab') as f:
+            # close a line torn by a crash, so it doesn't swallow the first new one
+            if f.tell() and not self.index_ends_with_newline(f.name):
+                f.write(b'\n')
+            f.write(''.join(lines).encode('utf-8'))
+
+    @staticmethod
+    def index_ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def has_channel(self, channel_name):
+        with self.lock:
+            return bool(self.index(channel_name))
+
+    # json archive taken over already: the index file stays when retention empties the channel
+    def imported(self, channel_name):
+        return os.path.exists(os.path.join(self.channel_dir(channel_name), INDEX_FILE))
+
+    def channels(self):
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if os.path.exists(os.path.join(self.root, n, INDEX_FILE)))
+
+    def count(self, channel_name):
+        with self.lock:
+            return len(self.index(channel_name))
+
+    def last_message_id(self, channel_name):
+        with self.lock:
+            ids = [int(i) for i in self.index(channel_name) if i.isdigit()]
+        return max(ids) if ids else None
+
+    # (id, location) pairs -> records, each segment mapped once
+    def read(self, channel_name, entries):
+        by_segment = {}
+        for position, (message_id, location) in enumerate(entries):
+            by_segment.setdefault(location[0], []).append((position, location))
+
+        records = [None] * len(entries)
+        for segment, locations in by_segment.items():
+            path = os.path.join(self.channel_dir(channel_name), segment_name(segment))
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for position, (_, offset, length, _) in locations:
+                    records[position] = json.loads(data[offset:offset + length])
+        return records
+
+    # newest first, same dicts as channel_data/*.json; only the wanted lines are parsed
+    def load_records(self, channel_name, limit=None):
+        with self.lock:
+            entries = sorted(self.index(channel_name).items(), key=sort_key, reverse=True)
+            if limit:
+                entries = entries[:int(limit)]
+            return self.read(channel_name, entries)
+
+    # the stored copies of these ids, the ones not archived (any more) left out
+    def load_ids(self, channel_name, ids):
+        with self.lock:
+            index = self.index(channel_name)
+            return self.read(channel_name, [(i, index[i]) for i in ids if i in index])
+
+    # appends records that are new or differ from the stored copy; returns how many
+    def upsert(self, channel_name, records):
+        with self.lock:
+            index = self.index(channel_name)
+
+            known = [(r['id'], index[r['id']]) for r in records if r['id'] in index]
+            stored = {record['id']: record for record in self.read(channel_name, known)}
+            changed = [
+                stored_record(r)
+                for r in records
+                if stored.get(r['id']) != stored_record(r)
+            ]
+            if not changed:
+                return 0
+
+            directory = self.channel_dir(channel_name)
+            os.makedirs(directory, exist_ok=True)
+            segments = self.segments(channel_name)
+            segment = segments[-1] if segments else 1
+
+            path = os.path.join(directory, segment_name(segment))
+            out = open(path, 'ab')
+            size = out.tell()
+            index_lines = []
+            try:
+                for record in changed:
+                    if size >= self.segment_size:
+                        out.close()
+                        segment += 1
+                        out = open(os.path.join(directory, segment_name(segment)), 'ab')
+                        size = 0
+
+                    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+                    out.write(line)
+                    index[record['id']] = (segment, size, len(line) - 1, record['pub_date'])
+                    index_lines.append(f"{record['id']}\t{segment}\t{size}\t{len(line) - 1}\t{record['pub_date']}\n")
+                    size += len(line)
+            finally:
+                out.close()
+
+            # segments first: an index line never points past the data
+            self.append_index(channel_name, index_lines)
+
+            return len(changed)
+
+    # keep newest max_count and/or max_days; tombstones now, space back at compaction
+    def apply_retention(self, channel_name, max_count=None, max_days=None):
+        with self.lock:
+            index = self.index(channel_name)
+            entries = sorted(index.items(), key=sort_key, reverse=True)
+
+            expired = set()
+            if max_days is not None:
+                cutoff = (datetime.now(timezone.utc) - timedelta(days=max_days)).isoformat()
+                expired.update(message_id for message_id, location in entries if location[3] < cutoff)
+            if max_count is not None:
+                expired.update(message_id for message_id, _ in entries[int(max_count):])
+
+            if expired:
+                self.append_index(channel_name, [f"{message_id}\t{TOMBSTONE}\n" for message_id in sorted(expired)])
+                for message_id in expired:
+                    del index[message_id]
+
+        if expired:
+            logger.info(f"✓ Retention: {len(expired)} old messages removed from {channel_name}")
+        return len(expired)
+
+    # share of segment bytes no longer in the index (older copies of edited records, expired ones)
+    def dead_ratio(self, channel_name):
+        directory = self.channel_dir(channel_name)
+        total = sum(os.path.getsize(os.path.join(directory, segment_name(n))) for n in self.segments(channel_name))
+        with self.lock:
+            live = sum(length + 1 for _, _, length, _ in self.index(channel_name).values())
+        return (total - live) / total if total else 0.0
+
+    # live records into new segments (oldest first) + a fresh index, then the old segments go
+    def compact(self, channel_name):
+        with self.lock:
+            directory = self.channel_dir(channel_name)
+            old_segments = self.segments(channel_name)
+            if not old_segments:
+                return 0
+
+            entries = sorted(self.index(channel_name).items(), key=sort_key)
+            segment = old_segments[-1] + 1
+            index = {}
+            index_lines = []
+            out = open(os.path.join(directory, segment_name(segment)), 'wb')
+            size = 0
+            try:
+                # read in batches so only one batch of records is in memory
+                for start in range(0, len(entries), 1000):
+                    batch = entries[start:start + 1000]
+                    for record in self.read(channel_name, batch):
+                        if size >= self.segment_size:
+                            out.close()
+                            segment += 1
+                            size = 0
+                            out = open(os.path.join(directory, segment_name(segment)), 'wb')
+
+                        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+                        out.write(line)
+                        index[record['id']] = (segment, size, len(line) - 1, record['pub_date'])
+                        index_lines.append(f"{record['id']}\t{segment}\t{size}\t{len(line) - 1}\t{record['pub_date']}\n")
+                        size += len(line)
+            finally:
+                out.close()
+
+            tmp = os.path.join(directory, f"{INDEX_FILE}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.writelines(index_lines)
+            os.replace(tmp, os.path.join(directory, INDEX_FILE))
+
+            for number in old_segments:
+                os.remove(os.path.join(directory, segment_name(number)))
+            self.indexes[channel_name] = index
+
+        logger.info(f"✓ Compacted {channel_name}: {len(old_segments)} -> {segment - old_segments[-1]} segment(s)")
+        return len(old_segments)
+
+    def import_json(self, data_filename):
+        with open(data_filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        channel_name = data['channel']
+        # oldest first, so the log reads in posting order
+        self.upsert(channel_name, list(reversed(data.get('messages', []))))
+        # an index even for an empty archive, see imported()
+        os.makedirs(self.channel_dir(channel_name), exist_ok=True)
+        with self.lock:
+            self.append_index(channel_name, [])
+        logger.info(f"✓ Imported {len(data.get('messages', []))} messages of {channel_name} into {self.root}")
+        return channel_name
+
+
+# python segment_log.py import|export|compact [log dir]
+def main():
+    run_command_line(SegmentLog, 'channel_data/log', {'compact': SegmentLog.compact})
+
+
+if __name__ == '__main__':
+    main()
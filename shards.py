@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+# update.py --shard i/N: the channels with shard_of(name, N) == i, each worker (matrix job or
+# local process) owning its slice of the tree. what a shard ran goes into a bundle:
+#   <bundle>/run.json      results, new + edited messages per channel, files, removed files
+#   <bundle>/files/...     the channel files it wrote, at their paths in the tree
+# update.py merge <bundles> puts the files in place and runs everything that spans channels
+# (fingerprints, indicators, search, cross-channel feeds, schedule) once over all messages
+
+RUN_FILE = 'run.json'
+FILES_DIR = 'files'
+
+
+# stable across runs and machines, unlike hash()
+def shard_of(channel_name, count):
+    return int(hashlib.sha1(channel_name.encode('utf-8')).hexdigest(), 16) % count
+
+
+# "i/N" -> (i, N)
+def parse_shard(text):
+    index, count = (int(part) for part in text.split('/'))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Bad shard {text}, expected i/N with 0 <= i < N")
+    return index, count
+
+
+# path -> mtime
+def snapshot(paths):
+    return {path: os.path.getmtime(path) for path in paths if os.path.exists(path)}
+
+
+# files new or written since `started` (a second of slack for coarse mtimes), and the ones gone
+def write_bundle(bundle_dir, run, before, after, started):
+    files = sorted(path for path, mtime in after.items() if path not in before or mtime >= started - 1)
+    removed = sorted(path for path in before if path not in after)
+
+    for path in files:
+        target = os.path.join(bundle_dir, FILES_DIR, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(path, target)
+
+    data = dict(run, files=files, removed=removed)
+    with open(os.path.join(bundle_dir, RUN_FILE), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return files, removed
+
+
+def read_bundle(bundle_dir):
+    with open(os.path.join(bundle_dir, RUN_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# bundle files into the tree; shards own disjoint channels, so nothing is overwritten by another shard
+def apply_bundle(bundle_dir, bundle):
+    for path in bundle['files']:
+        source = os.path.join(bundle_dir, FILES_DIR, path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # local runs share the tree: the file is in place already
+        if not os.path.exists(path) or not os.path.samefile(source, path):
+            shutil.copy2(source, path)
+
+    for path in bundle['removed']:
+        if os.path.exists(path):
+            os.remove(path)
+
+    return len(bundle['files']) + len(bundle['removed'])
+
+
+# python shards.py N [update.py options]: N shard processes side by side in this tree, then the merge
+def main():
+    if len(sys.argv) < 2 or not sys.argv[1].isdigit():
+        print("Usage: python shards.py N [update.py options, e.g. --due]")
+        return 2
+
+    count = int(sys.argv[1])
+    options = sys.argv[2:]
+    update = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'update.py')
+    bundles = [os.path.join('bundles', f"shard-{i}") for i in range(count)]
+
+    processes = [
+        subprocess.Popen([sys.executable, update, *options, '--shard', f"{i}/{count}", '--bundle', bundle])
+        for i, bundle in enumerate(bundles)
+    ]
+    failed = [i for i, process in enumerate(processes) if process.wait() != 0]
+    if failed:
+        print(f"! Shards failed: {', '.join(map(str, failed))}, not merging")
+        return 1
+
+    return subprocess.call([sys.executable, update, *options, 'merge', *bundles])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fixtures import page_for
+
+
+# ids 1..n, an hour apart, ascending like t.me shows them
+def make_messages(channel_name, n, text='Post {id}\nbody of post {id}'):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'id': str(i),
+            'title': f"Post {i}",
+            'text': text.format(id=i),
+            'link': f"https://t.me/{channel_name}/{i}",
+            'pub_date': (start + timedelta(hours=i)).isoformat()
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+# t.me/s/<channel> from a dict channel -> messages, no network.
+# fail: {url suffix: exception} raised instead of the page
+class FakeSite:
+    def __init__(self, archives, base_url='https://t.me/s/'):
+        self.archives = archives
+        self.base_url = base_url
+        self.fail = {}
+        self.requests = []
+
+    def fetch_page(self, url):
+        self.requests.append(url)
+        for suffix, error in self.fail.items():
+            if url.endswith(suffix):
+                raise error
+        path = url[len(self.base_url):]
+        channel_name, _, query = path.partition('?before=')
+        return page_for(channel_name, self.archives[channel_name], int(query) if query else None)
+
+    # stands in for TelegramRSSGenerator.fetch_response, no validators
+    def fetch_response(self, url, headers=None):
+        return SimpleNamespace(status_code=200, headers={}, content=self.fetch_page(url))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+# generator in workdir with list.json from settings + channel names, pages from site
+@pytest.fixture
+def make_generator(workdir):
+    def make(channels, settings=None, site=None):
+        settings = dict({'delay': 0, 'conditional_fetch': False, 'feed_window': 0}, **(settings or {}))
+        with open('list.json', 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'channels': [{'name': name} for name in channels]}, f)
+
+        from update import TelegramRSSGenerator
+
+        generator = TelegramRSSGenerator()
+        if site is not None:
+            generator.fetch_response = site.fetch_response
+        return generator
+    return make
+
+
+def write_archive(channel_name, messages):
+    os.makedirs('channel_data', exist_ok=True)
+    with open(f"channel_data/{channel_name}.json", 'w', encoding='utf-8') as f:
+        json.dump({'channel': channel_name, 'messages': messages}, f)
+    with open(f"channel_data/.{channel_name}_initialized", 'w') as f:
+        f.write('')
+
+
+def archived_ids(channel_name):
+    with open(f"channel_data/{channel_name}.json", 'r', encoding='utf-8') as f:
+        return sorted(int(m['id']) for m in json.load(f)['messages'])
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+import pytest
+
+from archive_db import SQLiteArchive
+from conftest import make_messages, write_archive
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'log'])
+def test_json_imported_once_even_after_retention_empties_the_channel(make_generator, storage):
+    write_archive('chan', make_messages('chan', 5))
+    generator = make_generator(['chan'], {'storage': storage})
+
+    archive = generator.get_channel_archive('chan')
+    assert archive.count('chan') == 5
+    archive.apply_retention('chan', max_count=0)
+    assert archive.count('chan') == 0
+
+    generator.close_archive_db()
+    assert generator.get_channel_archive('chan').count('chan') == 0
+    generator.close_archive_db()
+
+
+def test_dry_run_writes_no_database(make_generator):
+    write_archive('chan', make_messages('chan', 5))
+    generator = make_generator(['chan'], {'storage': 'sqlite'})
+    generator.dry_run = True
+
+    state = generator.load_channel_state('chan')
+    generator.close_archive_db()
+    assert len(state.messages) == 5
+    assert not os.path.exists('channel_data/archive.db')
+
+
+def test_dry_run_leaves_an_old_database_as_it_is(workdir):
+    # from before edit and import tracking
+    conn = sqlite3.connect('old.db')
+    conn.execute('CREATE TABLE messages (channel TEXT, id TEXT, num INTEGER, title TEXT, text TEXT, link TEXT, pub_date TEXT, PRIMARY KEY (channel, id))')
+    conn.execute("INSERT INTO messages VALUES ('chan', '1', 1, 't', 'x', 'l', '2025-01-01T00:00:00+00:00')")
+    conn.commit()
+    conn.close()
+    before = os.path.getmtime('old.db'), os.path.getsize('old.db')
+
+    archive = SQLiteArchive('old.db', readonly=True)
+    assert archive.imported('chan')
+    assert archive.load_records('chan')[0]['id'] == '1'
+    archive.close()
+    assert (os.path.getmtime('old.db'), os.path.getsize('old.db')) == before
+
+    archive = SQLiteArchive('old.db')
+    assert archive.imported('chan')
+    archive.close()
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'log'])
+def test_feed_runs_load_only_what_the_feed_needs(make_generator, storage):
+    write_archive('chan', make_messages('chan', 200))
+    generator = make_generator(['chan'], {'storage': storage, 'feed_window': 20, 'archive_page_size': 50})
+
+    assert len(generator.load_channel_state('chan').messages) == 70
+    assert len(generator.load_channel_state('chan', full=True).messages) == 200
+    generator.close_archive_db()
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from conftest import FakeSite, make_messages, write_archive
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'log'])
+def test_pruned_posts_on_the_first_page_stay_pruned(make_generator, storage):
+    site = FakeSite({'chan': make_messages('chan', 31)})
+    write_archive('chan', make_messages('chan', 30))
+    generator = make_generator(['chan'], {'storage': storage, 'retention_count': 10}, site=site)
+
+    result = generator.process_channel({'name': 'chan'})
+    assert (result['status'], result['messages']) == ('ok', 1)
+    assert generator.get_archive_db().count('chan') == 10
+
+    # the page still shows 12..31, 12..21 are gone from the archive
+    for _ in range(2):
+        result = generator.process_channel({'name': 'chan'})
+        assert (result['status'], result['messages']) == ('unchanged', 0)
+    assert generator.get_archive_db().count('chan') == 10
+    generator.close_archive_db()
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'log'])
+def test_edit_of_a_post_past_feed_limit_is_an_edit(make_generator, storage):
+    messages = make_messages('chan', 30)
+    site = FakeSite({'chan': messages})
+    write_archive('chan', make_messages('chan', 30))
+    generator = make_generator(['chan'], {'storage': storage, 'feed_limit': 5}, site=site)
+
+    messages[14]['text'] = 'Post 15\nbody, corrected'
+    result = generator.process_channel({'name': 'chan'})
+    assert (result['status'], result['messages']) == ('ok', 1)
+    assert generator.metrics.channels['chan']['counters'].get('messages_new', 0) == 0
+
+    stored = generator.get_archive_db().load_ids('chan', ['15'])[0]
+    assert stored['text'] == 'Post 15\nbody, corrected' and stored['edited']
+    generator.close_archive_db()
+
+
+def stored(channel_name):
+    with open(f"channel_data/{channel_name}.json", 'r', encoding='utf-8') as f:
+        return {m['id']: m for m in json.load(f)['messages']}
+
+
+@pytest.mark.parametrize('legacy', [False, True])
+def test_title_line_change_is_no_edit(make_generator, legacy):
+    messages = make_messages('chan', 10)
+    site = FakeSite({'chan': messages})
+    generator = make_generator(['chan'], site=site)
+    if legacy:
+        # archived before raw hashes, titles from line 0
+        write_archive('chan', make_messages('chan', 10))
+    else:
+        generator.process_channel({'name': 'chan'})
+        assert all(m.get('raw_hash') for m in stored('chan').values())
+
+    result = generator.process_channel({'name': 'chan', 'title_line': 1})
+    assert result['status'] == 'ok'
+    counters = generator.metrics.channels['chan']['counters']
+    assert counters.get('messages_edited', 0) == 0
+    assert all(m['title'].startswith('body of post') and 'edited' not in m for m in stored('chan').values())
+
+    # a real edit still is one
+    messages[9]['text'] = 'Post 10\nbody, corrected'
+    generator.process_channel({'name': 'chan', 'title_line': 1})
+    assert stored('chan')['10'].get('edited')
+    assert [i for i, m in stored('chan').items() if m.get('edited')] == ['10']
@@ -0,0 +1,24 @@
+import re
+
+from conftest import FakeSite, make_messages
+
+
+def item_ids(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [int(i) for i in re.findall(r'<link>https://t\.me/chan/(\d+)</link>', f.read())]
+
+
+def test_backfill_goes_to_archive_pages_and_the_head_keeps_the_window(make_generator):
+    site = FakeSite({'chan': make_messages('chan', 130)})
+    generator = make_generator(['chan'], {'feed_window': 20, 'archive_page_size': 50}, site=site)
+
+    generator.process_channel({'name': 'chan', 'initial_limit': 130})
+
+    # oldest first, 50 a page; 101..110 wait for the next full page
+    assert sorted(item_ids('rss_feeds/archive/chan/1.xml')) == list(range(1, 51))
+    assert sorted(item_ids('rss_feeds/archive/chan/2.xml')) == list(range(51, 101))
+    head = item_ids('rss_feeds/chan.xml')
+    assert len(head) == 20
+    assert sorted(head) == list(range(111, 131))
+    with open('rss_feeds/chan.xml', 'r', encoding='utf-8') as f:
+        assert 'rel="prev-archive"' in f.read()
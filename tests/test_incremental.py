@@ -0,0 +1,45 @@
+import os
+
+from conftest import FakeSite, make_messages, write_archive, archived_ids
+
+
+def test_failed_page_leaves_a_gap_filled_next_run(make_generator):
+    site = FakeSite({'chan': make_messages('chan', 60)})
+    write_archive('chan', make_messages('chan', 60)[:10])
+    generator = make_generator(['chan'], site=site)
+
+    # page 1 has 41..60, page 2 (21..40) fails: 11..40 must not be skipped for good
+    site.fail['?before=41'] = OSError('connection reset')
+    result = generator.process_channel({'name': 'chan'})
+    assert result['status'] == 'ok'
+    assert archived_ids('chan') == list(range(1, 11)) + list(range(41, 61))
+    assert generator.load_gap('chan') == {'after': 10, 'before': 41}
+
+    site.fail.clear()
+    result = generator.process_channel({'name': 'chan'})
+    assert result['status'] == 'ok'
+    assert archived_ids('chan') == list(range(1, 61))
+    assert generator.load_gap('chan') is None
+    assert not os.path.exists(generator.get_gap_file('chan'))
+
+
+def test_max_pages_walks_the_gap_over_several_runs(make_generator):
+    site = FakeSite({'chan': make_messages('chan', 100)})
+    write_archive('chan', make_messages('chan', 100)[:5])
+    generator = make_generator(['chan'], {'max_pages': 2}, site=site)
+
+    for _ in range(3):
+        generator.process_channel({'name': 'chan'})
+    assert archived_ids('chan') == list(range(1, 101))
+    assert generator.load_gap('chan') is None
+
+
+def test_no_validators_saved_while_a_gap_is_open(make_generator):
+    site = FakeSite({'chan': make_messages('chan', 60)})
+    write_archive('chan', make_messages('chan', 60)[:10])
+    generator = make_generator(['chan'], {'conditional_fetch': True}, site=site)
+    generator.fetch_first_page = lambda name, validators: (site.fetch_page(f"{site.base_url}{name}"), {'page_hash': 'x'})
+
+    site.fail['?before=41'] = OSError('connection reset')
+    generator.process_channel({'name': 'chan'})
+    assert generator.load_validators('chan') == {}
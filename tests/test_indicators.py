@@ -0,0 +1,25 @@
+import os
+import json
+
+from conftest import FakeSite, make_messages
+
+MD5 = 'd41d8cd98f00b204e9800998ecf8427e'
+SHA1 = 'da39a3ee5e6b4b0d3255bfef95601890afd80709'
+
+
+# fetched page -> parse + sanitize -> archive -> indicator index, as a real run does it
+def test_sha1_survives_sanitizing_into_the_index(make_generator):
+    messages = make_messages('chan', 3)
+    messages[1]['text'] = f"Sample hashes\nmd5 {MD5}\nsha1 {SHA1}\nsecret wJalrXUtnFEMI/K7MDENG/bPxRfiCYEXAMPLEKEY"
+    generator = make_generator(['chan'], {'search_index': False}, site=FakeSite({'chan': messages}))
+
+    generator.update_all_channels()
+
+    with open('channel_data/chan.json', 'r', encoding='utf-8') as f:
+        stored = next(m for m in json.load(f)['messages'] if m['id'] == '2')
+    assert SHA1 in stored['text']
+    assert '[REDACTED_AWS_SECRET]' in stored['text']
+
+    for kind, value in (('md5', MD5), ('sha1', SHA1)):
+        with open(os.path.join('rss_feeds/indicators', kind, f"{value}.json"), 'r', encoding='utf-8') as f:
+            assert [s['id'] for s in json.load(f)['sightings']] == ['2']
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from conftest import FakeSite, make_messages, write_archive
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'log'])
+def test_replay_keeps_to_archived_posts(make_generator, storage):
+    site = FakeSite({'chan': make_messages('chan', 31)})
+    write_archive('chan', make_messages('chan', 30))
+    settings = {'storage': storage, 'retention_count': 10, 'page_cache': True}
+    generator = make_generator(['chan'], settings, site=site)
+
+    # one cached page with 12..31, retention keeps 22..31
+    generator.update_all_channels()
+    assert generator.get_archive_db().count('chan') == 10
+    generator.close_archive_db()
+
+    site.fail[''] = AssertionError('replay went to the network')
+    [result] = generator.replay_channels()
+    assert (result['status'], result['messages']) == ('unchanged', 0)
+    assert generator.get_archive_db().count('chan') == 10
+    generator.close_archive_db()
+
+    # second line as title now: only the archived posts change, without an edit time
+    with open('list.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['channels'][0]['title_line'] = 1
+    [result] = generator.replay_channels(config['channels'])
+    assert (result['status'], result['messages']) == ('ok', 10)
+
+    records = generator.get_archive_db().load_records('chan')
+    generator.close_archive_db()
+    assert sorted(int(r['id']) for r in records) == list(range(22, 32))
+    assert all(r['title'].startswith('body of post') and 'edited' not in r for r in records)
@@ -0,0 +1,37 @@
+import os
+
+from conftest import FakeSite, make_messages
+from scheduler import PollScheduler
+from shards import shard_of
+
+# a b c d -> shard 0 of 2, e f -> shard 1
+CHANNELS = ['a', 'b', 'e', 'f']
+SETTINGS = {'schedule_budget': 1}
+
+
+# what update.py --due --shard i/2 --bundle bundles/shard-i does
+def run_shard(make_generator, site, index):
+    generator = make_generator(CHANNELS, SETTINGS, site)
+    generator.shard = f"{index}/2"
+    generator.bundle_dir = os.path.join('bundles', f"shard-{index}")
+    os.makedirs(generator.bundle_dir, exist_ok=True)
+    generator.settings['report_dir'] = os.path.join(generator.bundle_dir, 'reports')
+    channels = [c for c in generator.select_channels() if shard_of(c['name'], 2) == index]
+    return generator.update_due_channels(channels=channels)
+
+
+def run_tick(make_generator, site):
+    polled = run_shard(make_generator, site, 0) + run_shard(make_generator, site, 1)
+    make_generator(CHANNELS, SETTINGS, site).merge_bundles(['bundles/shard-0', 'bundles/shard-1'], due=True)
+    return polled
+
+
+def test_shards_share_the_poll_budget(make_generator):
+    site = FakeSite({name: make_messages(name, 3) for name in CHANNELS})
+
+    assert len(run_tick(make_generator, site)) == 1
+
+    # the merge charged the poll: nothing left for the next tick
+    generator = make_generator(CHANNELS, SETTINGS, site)
+    assert PollScheduler(generator.settings).state['budget']['tokens'] < 1
+    assert run_tick(make_generator, site) == []
@@ -0,0 +1,34 @@
+import time
+import threading
+
+
+def busy(seconds):
+    started = time.time()
+    time.sleep(seconds)
+    return started, time.time()
+
+
+def test_serial_runs_use_no_process_pool(make_generator):
+    generator = make_generator(['chan'], {'workers': 2})
+    assert generator.get_process_pool() is None
+    assert generator.run_stage(busy, 0) is not None
+
+
+def test_async_channels_overlap_in_the_pool(make_generator):
+    generator = make_generator(['a', 'b'], {'workers': 2, 'async': True})
+    assert generator.get_process_pool() is not None
+    # warm up: both worker processes started
+    generator.run_stage(busy, 0)
+
+    spans = []
+    threads = [threading.Thread(target=lambda: spans.append(generator.run_stage(busy, 0.5))) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        generator.close_process_pool()
+
+    (start_a, end_a), (start_b, end_b) = spans
+    assert start_a < end_b and start_b < end_a
@@ -0,0 +1,505 @@
+import re
+import uuid
+import hashlib
+import logging
+import importlib.util
+from datetime import datetime, timezone
+from sanitizer import sanitize_sensitive_data, sanitize_stats
+
+logger = logging.getLogger(__name__)
+
+WIDGET_CLASS = 'tgme_widget_message'
+
+# order of labels in "[Media: ...]"
+MEDIA_LABELS = ('Фото', 'Видео', 'Документ', 'Аудио')
+
+
+# ID used for fallback
+def extract_first_line_title(text, message_id, channel_config=None):
+
+    if not text or not text.strip():
+        return f"Message {message_id}"
+
+    # split text to lines
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+
+    if not lines:
+        return f"Message {message_id}"
+
+    # whitch line to title (from cfg)
+    title_line_index = 0
+    if channel_config and 'title_line' in channel_config:
+        title_line_index = channel_config['title_line']
+
+    if 0 <= title_line_index < len(lines):
+        first_line = lines[title_line_index]
+    else:
+        first_line = lines[0]
+
+    # strip length
+    max_length = 200
+    if len(first_line) <= max_length:
+        return first_line
+    else:
+        # strip by space
+        cut_pos = first_line.rfind(' ', 0, max_length)
+        if cut_pos > max_length * 0.8:
+            return first_line[:cut_pos] + "..."
+        else:
+            return first_line[:max_length-3] + "..."
+
+
+def has_class(tag, class_name):
+    classes = tag.get('class')
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        return class_name in classes.split()
+    return class_name in classes
+
+
+# bs4 reference: one find() per field
+def extract_media_info(widget):
+    media_types = []
+
+    # images
+    if widget.find('a', class_='tgme_widget_message_photo_wrap'):
+        media_types.append('Фото')
+
+    # video
+    if widget.find('video') or widget.find('i', class_='tgme_widget_message_video_player'):
+        media_types.append('Видео')
+
+    # docs
+    if widget.find('div', class_='tgme_widget_message_document'):
+        media_types.append('Документ')
+
+    # audio
+    if widget.find('audio') or widget.find('div', class_='tgme_widget_message_voice'):
+        media_types.append('Аудио')
+
+    return ', '.join(media_types) if media_types else None
+
+
+# raw widget fields -> message dict (shared by all backends)
+def build_message(channel_name, href, datetime_str, raw_text, media, channel_config=None):
+    message_id = href.split('/')[-1]
+    if not message_id:
+        # ID backup
+        message_id = str(uuid.uuid4())
+        logger.warning(f"!!! Empty ID, generated: {message_id}")
+
+    # date of publish
+    if datetime_str:
+        pub_date = datetime.fromisoformat(datetime_str.replace('Z', '+00:00'))
+    else:
+        pub_date = datetime.now(timezone.utc)
+
+    if raw_text is not None:
+        # normalize
+        lines = [line.strip() for line in raw_text.split('\n')]
+        text = '\n'.join(line for line in lines if line)  # deleting empty strings
+    else:
+        text = ""
+    # the post as telegram has it, before anything this side derives from it
+    source = raw_hash(text, media)
+
+    # sanitize secrets
+    text = sanitize_sensitive_data(text, channel_name)
+
+    # title catching
+    title = extract_first_line_title(text, message_id, channel_config)
+
+    # media catch
+    if media:
+        text += f"\n\n[Media: {media}]"
+
+    return {
+        'id': message_id,
+        'title': title,
+        'text': text,
+        'link': f"https://t.me/{channel_name}/{message_id}",
+        'pub_date': pub_date,
+        'channel': channel_name,
+        'raw_hash': source
+    }
+
+
+# original behaviour: whole page tree, find() per field.
+# bs4 is imported by the backends, so rendering from the archive never loads it
+class Bs4Backend:
+    name = 'bs4'
+
+    def widgets(self, content):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, 'html.parser')
+        return soup.find_all('div', class_=WIDGET_CLASS)
+
+    def widget_id(self, widget):
+        post = widget.get('data-post')
+        if post:
+            return post.split('/')[-1]
+
+        message_link = widget.find('a', class_='tgme_widget_message_date')
+        if message_link:
+            return message_link.get('href', '').split('/')[-1]
+        return ''
+
+    # (href, datetime, text, media) or None without a date link
+    def extract(self, widget):
+        message_link = widget.find('a', class_='tgme_widget_message_date')
+        if not message_link:
+            return None
+
+        datetime_elem = widget.find('time')
+        datetime_str = datetime_elem.get('datetime') if datetime_elem else None
+
+        raw_text = None
+        text_elem = widget.find('div', class_='tgme_widget_message_text')
+        if text_elem:
+            # replaced <br> with \n
+            for br in text_elem.find_all('br'):
+                br.replace_with('\n')
+            raw_text = text_elem.get_text(strip=False)
+
+        return message_link.get('href', ''), datetime_str, raw_text, extract_media_info(widget)
+
+
+# bs4 tree of the widgets only, each widget walked once
+class StrainerBackend(Bs4Backend):
+    name = 'strainer'
+
+    def __init__(self):
+        from bs4 import SoupStrainer
+
+        # regex: plain strings miss multi-class divs while parsing (bs4 4.13+)
+        self.strainer = SoupStrainer('div', class_=re.compile(rf'(?:^|\s){WIDGET_CLASS}(?:\s|$)'))
+
+    def widgets(self, content):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, 'html.parser', parse_only=self.strainer)
+        return soup.find_all('div', class_=WIDGET_CLASS)
+
+    def text_of(self, text_elem):
+        from bs4 import NavigableString, CData
+
+        types = text_elem.interesting_string_types or (NavigableString, CData)
+        if isinstance(types, type):
+            types = (types,)
+
+        parts = []
+        for node in text_elem.descendants:
+            if isinstance(node, NavigableString):
+                if type(node) in types:
+                    parts.append(str(node))
+            elif node.name == 'br':
+                parts.append('\n')
+        return ''.join(parts)
+
+    def extract(self, widget):
+        from bs4 import Tag
+
+        message_link = None
+        datetime_elem = None
+        text_elem = None
+        photo = video = document = audio = False
+
+        for node in widget.descendants:
+            if not isinstance(node, Tag):
+                continue
+            name = node.name
+
+            if name == 'a':
+                if message_link is None and has_class(node, 'tgme_widget_message_date'):
+                    message_link = node
+                if has_class(node, 'tgme_widget_message_photo_wrap'):
+                    photo = True
+            elif name == 'div':
+                if text_elem is None and has_class(node, 'tgme_widget_message_text'):
+                    text_elem = node
+                if has_class(node, 'tgme_widget_message_document'):
+                    document = True
+                if has_class(node, 'tgme_widget_message_voice'):
+                    audio = True
+            elif name == 'time':
+                if datetime_elem is None:
+                    datetime_elem = node
+            elif name == 'video':
+                video = True
+            elif name == 'audio':
+                audio = True
+            elif name == 'i' and has_class(node, 'tgme_widget_message_video_player'):
+                video = True
+
+        if message_link is None:
+            return None
+
+        datetime_str = datetime_elem.get('datetime') if datetime_elem is not None else None
+        raw_text = self.text_of(text_elem) if text_elem is not None else None
+        media = [label for label, found in zip(MEDIA_LABELS, (photo, video, document, audio)) if found]
+
+        return message_link.get('href', ''), datetime_str, raw_text, ', '.join(media) or None
+
+
+# libxml2 tree, same single walk (needs lxml)
+class LxmlBackend:
+    name = 'lxml'
+
+    # text of these never shows up in bs4's get_text()
+    SKIPPED_TEXT = ('script', 'style', 'template')
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+
+        self.html = lxml.html
+        self.etree = etree
+        self.parser = lxml.html.HTMLParser(encoding='utf-8')
+        self.widget_xpath = etree.XPath(
+            f"//div[contains(concat(' ', normalize-space(@class), ' '), ' {WIDGET_CLASS} ')]"
+        )
+
+    def widgets(self, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if not content.strip():
+            return []
+        return self.widget_xpath(self.html.document_fromstring(content, parser=self.parser))
+
+    def widget_id(self, widget):
+        post = widget.get('data-post')
+        if post:
+            return post.split('/')[-1]
+
+        for node in widget.iter('a'):
+            if has_class(node, 'tgme_widget_message_date'):
+                return (node.get('href') or '').split('/')[-1]
+        return ''
+
+    def text_of(self, text_elem):
+        parts = []
+
+        def walk(elem):
+            if elem.tag == 'br':
+                parts.append('\n')
+            elif isinstance(elem.tag, str) and elem.tag not in self.SKIPPED_TEXT and elem.text:
+                parts.append(elem.text)
+
+            if isinstance(elem.tag, str):
+                for child in elem:
+                    walk(child)
+                    if child.tail:
+                        parts.append(child.tail)
+
+        walk(text_elem)
+        return ''.join(parts)
+
+    def extract(self, widget):
+        message_link = None
+        datetime_elem = None
+        text_elem = None
+        photo = video = document = audio = False
+
+        for node in widget.iterdescendants():
+            name = node.tag
+            if not isinstance(name, str):
+                continue
+
+            if name == 'a':
+                if message_link is None and has_class(node, 'tgme_widget_message_date'):
+                    message_link = node
+                if has_class(node, 'tgme_widget_message_photo_wrap'):
+                    photo = True
+            elif name == 'div':
+                if text_elem is None and has_class(node, 'tgme_widget_message_text'):
+                    text_elem = node
+                if has_class(node, 'tgme_widget_message_document'):
+                    document = True
+                if has_class(node, 'tgme_widget_message_voice'):
+                    audio = True
+            elif name == 'time':
+                if datetime_elem is None:
+                    datetime_elem = node
+            elif name == 'video':
+                video = True
+            elif name == 'audio':
+                audio = True
+            elif name == 'i' and has_class(node, 'tgme_widget_message_video_player'):
+                video = True
+
+        if message_link is None:
+            return None
+
+        datetime_str = datetime_elem.get('datetime') if datetime_elem is not None else None
+        raw_text = self.text_of(text_elem) if text_elem is not None else None
+        media = [label for label, found in zip(MEDIA_LABELS, (photo, video, document, audio)) if found]
+
+        return message_link.get('href') or '', datetime_str, raw_text, ', '.join(media) or None
+
+
+BACKENDS = {
+    'bs4': Bs4Backend,
+    'strainer': StrainerBackend,
+    'lxml': LxmlBackend,
+}
+
+
+def make_backend(name='auto'):
+    if name == 'auto':
+        name = 'lxml' if importlib.util.find_spec('lxml') else 'strainer'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    return BACKENDS[name]()
+
+
+# t.me page -> widgets -> message dicts
+class MessageParser:
+    def __init__(self, backend='auto'):
+        self.backend = make_backend(backend)
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def widgets(self, content):
+        return self.backend.widgets(content)
+
+    def widget_id(self, widget):
+        return self.backend.widget_id(widget)
+
+    def parse_widget(self, widget, channel_name, channel_config=None):
+        try:
+            fields = self.backend.extract(widget)
+            if fields is None:
+                return None
+            return build_message(channel_name, *fields, channel_config=channel_config)
+        except Exception as e:
+            logger.warning(f"! Message parsing error: {e}")
+            return None
+
+    def parse_widgets(self, widgets, channel_name, channel_config=None):
+        messages = []
+        for widget in widgets:
+            message_data = self.parse_widget(widget, channel_name, channel_config)
+            if message_data:
+                messages.append(message_data)
+        return messages
+
+    def parse_page(self, content, channel_name, channel_config=None):
+        return self.parse_widgets(self.widgets(content), channel_name, channel_config)
+
+
+# markup that changes without a new or edited post: view counters, reactions,
+# per-request tokens and cdn links
+VOLATILE_MARKUP = re.compile(
+    rb'<span class="tgme_widget_message_views">[^<]*</span>'
+    rb'|<span class="tgme_reaction[^"]*">.*?</span>'
+    rb'|\sdata-view="[^"]*"'
+    rb'|https?://cdn\d*\.(?:telesco\.pe|cdn-telegram\.org)/file/[^\'"\s)]+',
+    re.DOTALL
+)
+
+
+# hash of the widget region of a page, equal as long as the posts are
+def page_fingerprint(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    start = content.find(b'tgme_widget_message_wrap')
+    if start == -1:
+        return hashlib.sha256(b'').hexdigest()
+    end = content.rfind(b'</section>')
+    region = content[start:end] if end > start else content[start:]
+
+    return hashlib.sha256(VOLATILE_MARKUP.sub(b'', region)).hexdigest()
+
+
+# what a reader sees of a message: title, text (media labels are part of it) and link.
+# views and the widget markup around it are not, so only a real edit changes the hash
+def content_hash(message):
+    content = '\x00'.join((message['title'], message['text'], message['link']))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+# text and media of the post as fetched: no title (title_line), no sanitizing, so a parser or
+# config change leaves it alone and only an edit on telegram's side changes it
+def raw_hash(text, media):
+    content = f"{text}\x00{media or ''}"
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+# compact, picklable form of a message for the process pool (and the feed writers)
+def to_record(message):
+    return (message['id'], message['title'], message['text'], message['link'], message['pub_date'])
+
+
+# parse results carry the raw hash on top
+def from_record(record, channel_name):
+    message_id, title, text, link, pub_date = record[:5]
+    message = {
+        'id': message_id,
+        'title': title,
+        'text': text,
+        'link': link,
+        'pub_date': pub_date,
+        'channel': channel_name
+    }
+    if len(record) > 5:
+        message['raw_hash'] = record[5]
+    return message
+
+
+# one parser per process
+_parsers = {}
+
+
+def get_parser(backend='auto'):
+    if backend not in _parsers:
+        _parsers[backend] = MessageParser(backend)
+    return _parsers[backend]
+
+
+# parse stage, runs in-process or in a pool worker:
+# newest `limit` widgets, stopping at ids <= after_id.
+# returns (records in page order, oldest id seen, known id reached, stats)
+def parse_page_records(content, channel_name, channel_config=None, backend='auto', after_id=None, limit=None):
+    parser = get_parser(backend)
+    sanitize_seconds, redactions = sanitize_stats()
+    widgets = parser.widgets(content)
+    if limit:
+        widgets = widgets[-limit:]
+
+    records = []
+    oldest = None
+    reached = False
+    parsed = 0
+
+    # newest first
+    for widget in reversed(widgets):
+        widget_id = parser.widget_id(widget)
+        if widget_id.isdigit():
+            if after_id is not None and int(widget_id) <= after_id:
+                reached = True
+                break
+            oldest = int(widget_id)
+        elif after_id is not None:
+            continue
+
+        parsed += 1
+        message_data = parser.parse_widget(widget, channel_name, channel_config)
+        if message_data:
+            records.append(to_record(message_data) + (message_data['raw_hash'],))
+
+    records.reverse()
+
+    # sanitizing happens inside parse_widget, reported apart
+    seconds, redacted = sanitize_stats()
+    stats = {
+        'widgets': len(widgets),
+        'parsed': parsed,
+        'sanitize': seconds - sanitize_seconds,
+        'redactions': redacted - redactions
+    }
+    return records, oldest, reached, stats
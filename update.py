@@ -1,27 +1,354 @@
-import requests
-from bs4 import BeautifulSoup
-import feedgenerator
-from datetime import datetime, timezone
-import re
+from datetime import datetime, timezone, timedelta
 import os
 import json
 import time
-from urllib.parse import urljoin, urlparse
+import threading
+from urllib.parse import urlparse
 import logging
-from playwright.sync_api import sync_playwright
+import argparse
+import shutil
+import importlib.util
+from archive_db import SQLiteArchive
+from segment_log import SegmentLog
+from metrics import RunMetrics, profile_run, write_json_report, write_prometheus
+from scheduler import PollScheduler, posting_rate
+from feed_writer import WRITERS, write_feeds
+from dedup import NearDuplicateIndex
+from indicators import IndicatorIndex, publish_indicators
+from search_index import SearchIndex
+from page_cache import PageCache
+from shards import shard_of, parse_shard, snapshot, write_bundle, read_bundle, apply_bundle
+from aggregate import FeedFilter, newest_first, load_aggregate, save_aggregate
+from sanitizer import sanitize_sensitive_data
+from tme_parser import MessageParser, extract_first_line_title, extract_media_info, parse_page_records, page_fingerprint, content_hash, to_record, from_record
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# default settings (override in "settings" block of list.json)
+DEFAULT_SETTINGS = {
+    'base_url': 'https://t.me/s/',
+    'async': False,
+    'concurrency': 8,
+    'delay': 2,
+    'backfill_mode': 'http',
+    'backfill_days': None,
+    'max_pages': 50,
+    'conditional_fetch': True,
+    'track_edits': True,
+    'page_cache': False,
+    'page_cache_dir': 'cache/pages',
+    'page_cache_days': 30,
+    'page_cache_size': 256 << 20,
+    'parser': 'auto',
+    'workers': 0,
+    'storage': 'json',
+    'sqlite_path': 'channel_data/archive.db',
+    'sqlite_export_json': False,
+    'log_dir': 'channel_data/log',
+    'log_segment_size': 1 << 20,
+    'log_compact_ratio': 0.5,
+    'feed_limit': None,  # rows loaded from sqlite/log; None: feed_window + archive_page_size
+    'feed_window': 50,
+    'archive_page_size': 50,
+    'feed_base_url': 'https://<user_name>.github.io/<rep_name>/',
+    'feed_formats': ['rss'],
+    'guid_policy': 'stable',
+    'aggregate_feed': 'all',
+    'aggregate_limit': 100,
+    'near_duplicates': True,
+    'duplicate_distance': 3,
+    'fingerprint_path': 'channel_data/.fingerprints',
+    'indicators': True,
+    'indicators_dir': 'rss_feeds/indicators',
+    'search_index': True,
+    'search_dir': 'rss_feeds/search',
+    'retention_count': None,
+    'retention_days': None,
+    'browser_contexts': 4,
+    'max_scrolls': 15,
+    'scroll_timeout': 1500,
+    'report_dir': 'reports',
+    'schedule_path': 'channel_data/.schedule.json',
+    'schedule_min_interval': 900,
+    'schedule_max_interval': 86400,
+    'schedule_backoff': 1.5,
+    'schedule_jitter': 0.1,
+    'schedule_budget': 120,
+    'schedule_window_days': 30,
+    'serve_host': '127.0.0.1',
+    'serve_port': 8080,
+    'serve_max_age': 60,
+    'profile': None,
+    'rate_limits': {
+        't.me': {'rate': 1.0, 'burst': 3}
+    }
+}
+
+
+# token bucket, shared between worker threads
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+
+
+# widgets counted in page, no html round trip
+COUNT_WIDGETS_JS = "() => document.querySelectorAll('div.tgme_widget_message').length"
+WIDGETS_GREW_JS = "n => document.querySelectorAll('div.tgme_widget_message').length > n"
+
+
+# one chromium per run, contexts shared between worker threads
+# (async playwright lives on its own loop thread, callers just block on results)
+class BrowserPool:
+    def __init__(self, size=4, user_agent=None):
+        self.size = max(int(size), 1)
+        self.user_agent = user_agent
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop:
+                return
+            import asyncio
+
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+            try:
+                self.call(self._start())
+            except BaseException:
+                # no half-started pool: the next start() tries again from scratch
+                self.stop_loop()
+                raise
+            logger.info(f"✓ Browser started ({self.size} contexts)")
+
+    def stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.thread = None
+
+    def call(self, coro):
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _start(self):
+        # optional dependency, only needed for browser backfill
+        import asyncio
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = None
+        try:
+            self.browser = await self.playwright.chromium.launch(headless=True)
+            self.contexts = asyncio.Queue()
+            for _ in range(self.size):
+                context = await self.browser.new_context(user_agent=self.user_agent)
+                self.contexts.put_nowait(context)
+        except BaseException:
+            if self.browser is not None:
+                await self.browser.close()
+            await self.playwright.stop()
+            raise
+
+    async def _close(self):
+        await self.browser.close()
+        await self.playwright.stop()
+
+    def close(self):
+        with self.lock:
+            if not self.loop:
+                return
+            try:
+                self.call(self._close())
+            finally:
+                self.stop_loop()
+
+    # returns page html once limit is reached or feed stops growing
+    def scroll_page(self, url, limit, max_scrolls=15, timeout=1500):
+        self.start()
+        return self.call(self._scroll_page(url, limit, max_scrolls, timeout))
+
+    async def _scroll_page(self, url, limit, max_scrolls, timeout):
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        context = await self.contexts.get()
+        page = await context.new_page()
+
+        try:
+            await page.goto(url)
+            count = await page.evaluate(COUNT_WIDGETS_JS)
+
+            # scrolling
+            for scroll_num in range(max_scrolls):
+                if count >= limit:
+                    break
+
+                await page.evaluate("window.scrollTo(0, 0)")
+                try:
+                    await page.wait_for_function(WIDGETS_GREW_JS, arg=count, timeout=timeout)
+                except PlaywrightTimeoutError:
+                    # nothing older loaded
+                    break
+
+                count = await page.evaluate(COUNT_WIDGETS_JS)
+                logger.info(f"  Scroll {scroll_num + 1}: {count} messages loaded")
+
+            return await page.content()
+        finally:
+            await page.close()
+            self.contexts.put_nowait(context)
+
+
+# archive of one channel: loaded once, shared by rss and data writers
+class ChannelState:
+    def __init__(self, channel_name):
+        self.channel_name = channel_name
+        self.messages = {}  # id -> message, pub_date as datetime
+        self.last_message_id = None
+        self.changed = set()
+        self.edited = set()  # ids merge() found edited on telegram's side
+
+    @classmethod
+    def from_records(cls, channel_name, records, last_message_id=None):
+        state = cls(channel_name)
+
+        for old_msg in records:
+            state.messages[old_msg['id']] = {
+                'id': old_msg['id'],
+                'title': old_msg['title'],
+                'text': old_msg['text'],
+                'link': old_msg['link'],
+                'pub_date': datetime.fromisoformat(old_msg['pub_date']),
+                'channel': channel_name
+            }
+            if old_msg.get('edited'):
+                state.messages[old_msg['id']]['edited'] = datetime.fromisoformat(old_msg['edited'])
+            if old_msg.get('raw_hash'):
+                state.messages[old_msg['id']]['raw_hash'] = old_msg['raw_hash']
+
+        state.last_message_id = last_message_id
+        if state.last_message_id is None:
+            ids = [int(i) for i in state.messages if i.isdigit()]
+            state.last_message_id = max(ids) if ids else None
+
+        return state
+
+    @classmethod
+    def load(cls, data_filename, channel_name):
+        state = cls(channel_name)
+
+        if os.path.exists(data_filename):
+            try:
+                with open(data_filename, 'r', encoding='utf-8') as f:
+                    old_data = json.load(f)
+
+                state = cls.from_records(channel_name, old_data.get('messages', []), old_data.get('last_message_id'))
+                logger.info(f"✓ Loaded {len(state.messages)} old messages")
+            except Exception as e:
+                logger.warning(f"Could not read old data: {e}")
+
+        return state
+
+    # O(new): newer copy wins when its content hash differs (see content_hash). an edit is a
+    # different raw hash (tme_parser.raw_hash), or different text for records stored without one:
+    # it gets 'edited' = when the change was seen. a title or sanitizer change (config, parser)
+    # only rewrites the copy, the edit time stays. returns new + rewritten messages.
+    # reparsed: copies from cached pages, never an edit
+    def merge(self, messages, reparsed=False):
+        changed = []
+        for message in messages:
+            known = self.messages.get(message['id'])
+            if known is not None:
+                if known is message:
+                    continue
+                if known.get('raw_hash') and message.get('raw_hash'):
+                    edited = known['raw_hash'] != message['raw_hash']
+                else:
+                    edited = known['text'] != message['text']
+                # an unedited copy of an old record stays old: text still tells its edits
+                if not edited and content_hash(known) == content_hash(message):
+                    continue
+
+                if edited and not reparsed:
+                    message['edited'] = datetime.now(timezone.utc)
+                    self.edited.add(message['id'])
+                elif known.get('edited'):
+                    message['edited'] = known['edited']
+
+            self.messages[message['id']] = message
+            self.changed.add(message['id'])
+            changed.append(message)
+
+            if message['id'].isdigit():
+                message_id = int(message['id'])
+                if self.last_message_id is None or message_id > self.last_message_id:
+                    self.last_message_id = message_id
+
+        return changed
+
+    # newest id first
+    def feed_messages(self):
+        return sorted(self.messages.values(), key=lambda x: int(x['id']), reverse=True)
+
+    def to_record(self, msg):
+        record = {
+            'id': msg['id'],
+            'title': msg['title'],
+            'text': msg['text'],
+            'link': msg['link'],
+            'pub_date': msg['pub_date'].isoformat()
+        }
+        if msg.get('edited'):
+            record['edited'] = msg['edited'].isoformat()
+        if msg.get('raw_hash'):
+            record['raw_hash'] = msg['raw_hash']
+        return record
+
+    # newest date first, as stored on disk
+    def archive_records(self):
+        records = [self.to_record(msg) for msg in self.messages.values()]
+        return sorted(records, key=lambda x: x['pub_date'], reverse=True)
+
+    # only what merge() touched
+    def changed_records(self):
+        return [self.to_record(self.messages[i]) for i in self.changed]
+
+
 class TelegramRSSGenerator:
     def __init__(self, config_file='list.json'):
 
         self.config_file = config_file
-        self.base_url = 'https://t.me/s/'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-        })
+
+        # requests, parser, browser, pools: created on first use, so render and
+        # index runs never import what only fetching needs
+        self.session = None
+        self.session_lock = threading.Lock()
         
         # dirs for RSS
         os.makedirs('rss_feeds', exist_ok=True)
@@ -29,6 +356,49 @@ class TelegramRSSGenerator:
 
         # config upload
         self.channels = self.load_channels_config()
+        self.settings = dict(DEFAULT_SETTINGS, **self.channels.get('settings', {}))
+        # overridable, e.g. a local stand-in for benchmarks
+        self.base_url = self.settings['base_url']
+        if self.settings['workers'] > 0 and not self.settings['async']:
+            logger.warning(f"! workers: {self.settings['workers']} needs async: true, parsing in process")
+
+        # per-host limiters
+        self.rate_limiters = {}
+        self.rate_limiters_lock = threading.Lock()
+
+        # lxml if installed, else bs4 with a strainer
+        self.parser = None
+
+        # parse/render processes (workers > 0, async only), started on first use
+        self.process_pool = None
+        self.process_pool_lock = threading.Lock()
+
+        # sqlite storage, opened on first use
+        self.archive_db = None
+        self.archive_db_lock = threading.Lock()
+
+        # raw pages for replay (page_cache), opened on first use
+        self.page_cache = None
+        self.page_cache_lock = threading.Lock()
+
+        # started on first new channel
+        self.browser_pool = None
+        self.browser_pool_lock = threading.Lock()
+
+        # stage timings and counters, fresh for every update_all_channels
+        self.metrics = RunMetrics()
+        # channel -> messages got this run, for the cross-channel feeds
+        self.run_messages = {}
+        # simhash index of all archives, loaded on first use
+        self.duplicate_index = None
+
+        # in-memory feeds for --serve, None otherwise
+        self.feed_store = None
+        # fetch and parse, but write nothing (--dry-run)
+        self.dry_run = False
+        # --shard i/N: channel files and a bundle for the merge, nothing shared (see shards.py)
+        self.shard = None
+        self.bundle_dir = None
 
     def load_channels_config(self):
 
@@ -55,7 +425,161 @@ class TelegramRSSGenerator:
         with open(flag_file, 'w') as f:
             f.write(datetime.now(timezone.utc).isoformat())
         logger.info(f"✓ Channel {channel_name} marked as initialized")
+
+    # validators of the first page (etag, last-modified, widget hash) from the last run
+    def get_validators_file(self, channel_name):
+        return f"channel_data/.{channel_name}_validators"
+
+    def load_validators(self, channel_name):
+        try:
+            with open(self.get_validators_file(channel_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_validators(self, channel_name, validators):
+        with open(self.get_validators_file(channel_name), 'w', encoding='utf-8') as f:
+            json.dump(validators, f, sort_keys=True)
+
+    # posts an incremental walk could not reach: {"after": id, "before": id}, both exclusive
+    def get_gap_file(self, channel_name):
+        return f"channel_data/.{channel_name}_gap"
+
+    def load_gap(self, channel_name):
+        try:
+            with open(self.get_gap_file(channel_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_gap(self, channel_name, gap):
+        if gap is None:
+            if os.path.exists(self.get_gap_file(channel_name)):
+                os.remove(self.get_gap_file(channel_name))
+            return
+        with open(self.get_gap_file(channel_name), 'w', encoding='utf-8') as f:
+            json.dump(gap, f, sort_keys=True)
     
+    def get_session(self):
+        with self.session_lock:
+            if self.session is None:
+                import requests
+
+                self.session = requests.Session()
+                self.session.headers.update({'User-Agent': USER_AGENT})
+
+                # connection pool big enough for all workers
+                pool_size = max(int(self.settings['concurrency']), 10)
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+            return self.session
+
+    def get_parser(self):
+        if self.parser is None:
+            self.parser = MessageParser(self.settings['parser'])
+        return self.parser
+
+    def get_rate_limiter(self, url):
+        host = urlparse(url).hostname or ''
+
+        with self.rate_limiters_lock:
+            if host not in self.rate_limiters:
+                limits = self.settings['rate_limits'].get(host)
+                self.rate_limiters[host] = TokenBucket(limits['rate'], limits.get('burst', 1)) if limits else None
+            return self.rate_limiters[host]
+
+    # every http request goes through here
+    def fetch_response(self, url, headers=None):
+        limiter = self.get_rate_limiter(url)
+        if limiter:
+            with self.metrics.stage('rate_limit'):
+                limiter.acquire()
+
+        with self.metrics.stage('fetch'):
+            response = self.get_session().get(url, headers=headers, timeout=10)
+            response.raise_for_status()
+
+        self.metrics.count('requests')
+        self.metrics.count('bytes_fetched', len(response.content))
+        return response
+
+    def fetch_page(self, url):
+        content = self.fetch_response(url).content
+        self.store_page(url, content)
+        return content
+
+    def get_page_cache(self):
+        with self.page_cache_lock:
+            if self.page_cache is None:
+                self.page_cache = PageCache(
+                    self.settings['page_cache_dir'],
+                    self.settings['page_cache_days'],
+                    self.settings['page_cache_size']
+                )
+            return self.page_cache
+
+    # raw page as fetched, when page_cache is on; never fails the fetch
+    def store_page(self, url, content, fingerprint=None):
+        if not self.settings['page_cache'] or self.dry_run:
+            return
+        channel_name = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+        try:
+            with self.metrics.stage('page_cache'):
+                if self.get_page_cache().store(channel_name, url, content, fingerprint):
+                    self.metrics.count('pages_cached')
+        except OSError as e:
+            logger.warning(f"! Could not cache {url}: {e}")
+
+    # ttl and size limits, after a run that may have added pages
+    def evict_page_cache(self):
+        if not self.settings['page_cache'] or self.dry_run:
+            return
+        with self.metrics.stage('page_cache'):
+            self.get_page_cache().evict()
+
+    # first page against last run's validators:
+    # (None, validators) when nothing changed, else (content, new validators)
+    def fetch_first_page(self, channel_name, validators):
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        url = f"{self.base_url}{channel_name}"
+        response = self.fetch_response(url, headers)
+        if response.status_code == 304:
+            return None, validators
+
+        fresh = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'page_hash': page_fingerprint(response.content)
+        }
+        fresh = {k: v for k, v in fresh.items() if v}
+
+        # new etag, same posts (views, reactions...)
+        if fresh['page_hash'] == validators.get('page_hash'):
+            return None, fresh
+        self.store_page(url, response.content, fresh['page_hash'])
+        return response.content, fresh
+
+    def get_browser_pool(self):
+        with self.browser_pool_lock:
+            if self.browser_pool is None:
+                self.browser_pool = BrowserPool(
+                    self.settings['browser_contexts'],
+                    USER_AGENT
+                )
+            return self.browser_pool
+
+    def close_browser_pool(self):
+        with self.browser_pool_lock:
+            if self.browser_pool is not None:
+                self.browser_pool.close()
+                self.browser_pool = None
+
     # scrape with scrolling (for new channels)     
     def scrape_channel_messages_with_scroll(self, channel_name, limit=30, channel_config=None):
 
@@ -65,77 +589,287 @@ class TelegramRSSGenerator:
         try:
             logger.info(f"[] Scraping with scroll: {channel_name} (target: {limit})")
             
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.set_extra_http_headers({
-                    'User-Agent': self.session.headers['User-Agent']
-                })
-                
-                page.goto(url)
-                page.wait_for_timeout(2000)  
-                
-                # scrolling
-                for scroll_num in range(15):  
-                    page.evaluate("window.scrollTo(0, 0)")
-                    page.wait_for_timeout(1500)
-                    
-                    # message counter
-                    soup = BeautifulSoup(page.content(), 'html.parser')
-                    widgets = soup.find_all('div', class_='tgme_widget_message')
-                    
-                    logger.info(f"  Scroll {scroll_num + 1}: {len(widgets)} messages loaded")
-                    
-                    # Еstop logic after limit
-                    if len(widgets) >= limit:
-                        break
-                
-                # parsing
-                html = page.content()
-                browser.close()
-                soup = BeautifulSoup(html, 'html.parser')
-                message_widgets = soup.find_all('div', class_='tgme_widget_message')
-                
-                # take newest
-                for widget in message_widgets[-limit:]:
-                    try:
-                        message_data = self.parse_message_widget(widget, channel_name, channel_config)
-                        if message_data:
-                            messages.append(message_data)
-                    except Exception as e:
-                        logger.warning(f"Parsing error: {e}")
-                        continue
+            limiter = self.get_rate_limiter(url)
+            if limiter:
+                limiter.acquire()
 
-                logger.info(f"✓ Collected {len(messages)} messages from {channel_name}")
+            with self.metrics.stage('browser'):
+                html = self.get_browser_pool().scroll_page(
+                    url,
+                    limit,
+                    self.settings['max_scrolls'],
+                    self.settings['scroll_timeout']
+                )
+            self.metrics.count('bytes_fetched', len(html.encode('utf-8')))
+            self.store_page(url, html)
+
+            # parsing once, newest
+            messages, _, _ = self.parse_page_records(html, channel_name, channel_config, limit=limit)
+
+            logger.info(f"✓ Collected {len(messages)} messages from {channel_name}")
             
         except Exception as e:
             logger.error(f"! Error scraping {channel_name}: {e}")
         
         return messages 
        
+    # backfill w/o browser: walk ?before=<id> pages back
+    def scrape_channel_messages_paginated(self, channel_name, limit=30, channel_config=None, since=None):
+
+        messages = {}
+        before = None
+        
+        try:
+            logger.info(f"[] Scraping with pagination: {channel_name} (target: {limit})")
+
+            for page_num in range(self.settings['max_pages']):
+                url = f"{self.base_url}{channel_name}"
+                if before is not None:
+                    url += f"?before={before}"
+
+                page_messages, oldest, _ = self.parse_page_records(self.fetch_page(url), channel_name, channel_config)
+                if oldest is None or not page_messages:
+                    break
+
+                for message in page_messages:
+                    if since is None or message['pub_date'] >= since:
+                        messages.setdefault(message['id'], message)
+
+                logger.info(f"  Page {page_num + 1}: {len(messages)} messages collected")
+
+                if len(messages) >= limit or oldest <= 1 or (before is not None and oldest >= before):
+                    break
+                # date cutoff reached
+                if since is not None and min(m['pub_date'] for m in page_messages) < since:
+                    break
+                before = oldest
+
+            logger.info(f"✓ Collected {min(len(messages), limit)} messages from {channel_name}")
+            
+        except Exception as e:
+            logger.error(f"! Error in paginated scraping {channel_name}: {e}")
+
+        # newest, in page order
+        ordered = sorted(messages.values(), key=lambda m: int(m['id']) if m['id'].isdigit() else 0)
+        return ordered[-limit:] if limit else []
+
+    def parse_page(self, content, channel_name, channel_config=None):
+        return self.parse_page_records(content, channel_name, channel_config)[0]
+
+    # only with async: serial channels would block on one job at a time,
+    # paying for the pickling and getting no overlap
+    def get_process_pool(self):
+        if self.settings['workers'] <= 0 or not self.settings['async']:
+            return None
+
+        with self.process_pool_lock:
+            if self.process_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                self.process_pool = ProcessPoolExecutor(max_workers=self.settings['workers'])
+                logger.info(f"✓ Process pool started ({self.settings['workers']} workers)")
+            return self.process_pool
+
+    def close_process_pool(self):
+        with self.process_pool_lock:
+            if self.process_pool is not None:
+                self.process_pool.shutdown()
+                self.process_pool = None
+
+    # cpu-heavy stages go to the pool when there is one
+    def run_stage(self, func, *args):
+        pool = self.get_process_pool()
+        if pool is None:
+            return func(*args)
+        return pool.submit(func, *args).result()
+
+    # raw page -> messages (see tme_parser.parse_page_records)
+    def parse_page_records(self, content, channel_name, channel_config=None, after_id=None, limit=None):
+        with self.metrics.stage('parse'):
+            records, oldest, reached, stats = self.run_stage(
+                parse_page_records,
+                content,
+                channel_name,
+                channel_config,
+                self.get_parser().name,
+                after_id,
+                limit
+            )
+
+        # part of 'parse' already, broken out
+        self.metrics.add_time('sanitize', stats['sanitize'])
+        self.metrics.count('widgets_seen', stats['widgets'])
+        self.metrics.count('widgets_parsed', stats['parsed'])
+        self.metrics.count('redactions', stats['redactions'])
+        return [from_record(r, channel_name) for r in records], oldest, reached
+
+    def get_backfill_cutoff(self, channel_config):
+        days = channel_config.get('initial_days', self.settings['backfill_days'])
+        if days is None:
+            return None
+        return datetime.now(timezone.utc) - timedelta(days=days)
+
+    def backfill_channel(self, channel_name, limit, channel_config):
+        mode = self.settings['backfill_mode']
+
+        if mode == 'http':
+            since = self.get_backfill_cutoff(channel_config)
+            messages = self.scrape_channel_messages_paginated(channel_name, limit, channel_config, since)
+            if messages:
+                return messages
+
+            # browser is only a fallback now
+            if importlib.util.find_spec('playwright') is None:
+                return messages
+            logger.info(f"  No messages over http, falling back to browser")
+
+        return self.scrape_channel_messages_with_scroll(channel_name, limit, channel_config)
+
+    # id without full widget parse
+    def get_widget_id(self, widget):
+        return self.get_parser().widget_id(widget)
+
+    # storage 'sqlite' or 'log'; both keep the SQLiteArchive interface
+    def get_archive_db(self):
+        with self.archive_db_lock:
+            if self.archive_db is None:
+                if self.settings['storage'] == 'log':
+                    self.archive_db = SegmentLog(self.settings['log_dir'], self.settings['log_segment_size'])
+                else:
+                    self.archive_db = SQLiteArchive(self.settings['sqlite_path'], readonly=self.dry_run)
+            return self.archive_db
+
+    # rewrite log segments of channels where dead records piled up
+    def compact_archive(self):
+        if self.settings['storage'] != 'log' or self.archive_db is None:
+            return
+        for channel_config in self.channels['channels']:
+            if self.archive_db.dead_ratio(channel_config['name']) > self.settings['log_compact_ratio']:
+                self.archive_db.compact(channel_config['name'])
+
+    def close_archive_db(self):
+        with self.archive_db_lock:
+            if self.archive_db is not None:
+                self.archive_db.close()
+                self.archive_db = None
+
+    # sqlite / log archive, the channel's json archive taken over on first use (once:
+    # a channel emptied by retention is not imported again). a dry run imports nothing
+    def get_channel_archive(self, channel_name):
+        archive = self.get_archive_db()
+        data_filename = f"channel_data/{channel_name}.json"
+        if not self.dry_run and not archive.imported(channel_name) and os.path.exists(data_filename):
+            archive.import_json(data_filename)
+        return archive
+
+    # rows a feed run needs from sqlite/log: the head plus a page still being filled
+    # (see write_archive_pages); None = all of them
+    def feed_load_limit(self):
+        if self.settings['feed_limit'] is not None:
+            return self.settings['feed_limit']
+        if self.settings['feed_window']:
+            return self.settings['feed_window'] + self.settings['archive_page_size']
+        return None
+
+    # full: the whole archive, for index builds and replay; else only what the feed needs
+    def load_channel_state(self, channel_name, full=False):
+        data_filename = f"channel_data/{channel_name}.json"
+
+        if self.settings['storage'] not in ('sqlite', 'log'):
+            return ChannelState.load(data_filename, channel_name)
+
+        archive = self.get_channel_archive(channel_name)
+        # dry run on a json archive not taken over yet: read it where it is
+        if self.dry_run and not archive.imported(channel_name) and os.path.exists(data_filename):
+            return ChannelState.load(data_filename, channel_name)
+
+        records = archive.load_records(channel_name, None if full else self.feed_load_limit())
+        state = ChannelState.from_records(channel_name, records, archive.last_message_id(channel_name))
+        logger.info(f"✓ Loaded {len(state.messages)} old messages ({self.settings['storage']})")
+        return state
+
+    # posts at or below last_id (any, for None) that the loaded state lacks: archived ones (past
+    # feed_limit) are loaded to compare against, ones retention removed are dropped instead of
+    # coming back as new. ids inside `gap` are really missing and stay
+    def known_messages(self, state, messages, last_id=None, gap=None):
+        def unknown(message):
+            if not message['id'].isdigit() or message['id'] in state.messages:
+                return False
+            number = int(message['id'])
+            return (last_id is None or number <= last_id) and not (gap and gap['after'] < number < gap['before'])
+
+        missing = [m['id'] for m in messages if unknown(m)]
+        if not missing:
+            return messages
+        if self.settings['storage'] in ('sqlite', 'log'):
+            records = self.get_archive_db().load_ids(state.channel_name, missing)
+            state.messages.update(ChannelState.from_records(state.channel_name, records).messages)
+        return [m for m in messages if not unknown(m)]
+
+    # incremental: everything newer than last_id, following ?before= pages (from `before` down, if given).
+    # returns (messages, gap): gap is None once last_id was reached, else the id the walk stopped
+    # at (a page failed or max_pages ran out), posts between last_id and it are still missing
+    def scrape_channel_messages_since(self, channel_name, last_id, channel_config=None, first_page=None, before=None):
+
+        messages = []
+        reached = False
+        top = before
+
+        try:
+            logger.info(f" Incremental scraping: {channel_name} (after: {last_id}{f', before: {before}' if before else ''})")
+
+            for page_num in range(self.settings['max_pages']):
+                url = f"{self.base_url}{channel_name}"
+                if before is not None:
+                    url += f"?before={before}"
+
+                content = first_page if before is None and first_page is not None else self.fetch_page(url)
+
+                # stops at known posts, no parsing below last_id; with track_edits the
+                # known posts of the first page come along, merge() keeps only the edited ones
+                whole = before is None and self.settings['track_edits']
+                page_messages, oldest, reached = self.parse_page_records(
+                    content,
+                    channel_name,
+                    channel_config,
+                    after_id=None if whole else last_id
+                )
+                if whole:
+                    reached = oldest is not None and oldest <= last_id
+
+                # keep page order (oldest first)
+                messages = page_messages + messages
+
+                # empty page or no way further back: nothing older to miss
+                if oldest is None or (before is not None and oldest >= before):
+                    reached = True
+                if reached:
+                    break
+                before = oldest
+                logger.info(f"  Page {page_num + 1}: {len(messages)} new so far, going back")
+
+            logger.info(f"✓ Incremental collected {len(messages)} messages from {channel_name}")
+            
+        except Exception as e:
+            logger.error(f"! Error in incremental scraping {channel_name}: {e}")
+
+        if reached:
+            return messages, None
+        logger.warning(f"! {channel_name}: stopped before reaching {last_id}, the rest next run")
+        return messages, before if before is not None else top
+
     # quick scraping w/ scrolling
-    def scrape_channel_messages_quick(self, channel_name, limit=5, channel_config=None):
+    def scrape_channel_messages_quick(self, channel_name, limit=5, channel_config=None, first_page=None):
 
         url = f"{self.base_url}{channel_name}"
         messages = []
         
         try:
             logger.info(f" Quick scraping: {channel_name} (limit: {limit})")
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            message_widgets = soup.find_all('div', class_='tgme_widget_message')
+            content = first_page if first_page is not None else self.fetch_page(url)
             
             # newest
-            for widget in message_widgets[-limit:]:
-                try:
-                    message_data = self.parse_message_widget(widget, channel_name, channel_config)
-                    if message_data:
-                        messages.append(message_data)
-                except Exception as e:
-                    logger.warning(f"Parsing error: {e}")
-                    continue
+            messages, _, _ = self.parse_page_records(content, channel_name, channel_config, limit=limit)
 
             logger.info(f"✓ Quick collected {len(messages)} messages from {channel_name}")
             
@@ -144,279 +878,315 @@ class TelegramRSSGenerator:
         
         return messages
     
+    # widget of the active parser backend (see tme_parser.py)
     def parse_message_widget(self, widget, channel_name, channel_config=None):
-        try:
-            # message ID
-            message_link = widget.find('a', class_='tgme_widget_message_date')
-            if not message_link:
-                return None
-                
-            message_id = message_link.get('href', '').split('/')[-1]
-            if not message_id:
-                # ID backup
-                import uuid
-                message_id = str(uuid.uuid4())
-                logger.warning(f"!!! Empty ID, generated: {message_id}")
-            
-            # date of publish
-            datetime_elem = widget.find('time')
-            if datetime_elem:
-                datetime_str = datetime_elem.get('datetime')
-                if datetime_str:
-                    pub_date = datetime.fromisoformat(datetime_str.replace('Z', '+00:00'))
-                else:
-                    pub_date = datetime.now(timezone.utc)
-            else:
-                pub_date = datetime.now(timezone.utc)
-            
-            # message text
-            text_elem = widget.find('div', class_='tgme_widget_message_text')
-            if text_elem:
-                # replaced <br> with \n 
-                for br in text_elem.find_all('br'):
-                    br.replace_with('\n')
-                
-                # no sep
-                text = text_elem.get_text(strip=False)
-                
-                # normalize
-                lines = [line.strip() for line in text.split('\n')]
-                text = '\n'.join(line for line in lines if line)  # deleting empty strings
-            else:
-                text = ""
-            # sanitize secrets
-            text = self.sanitize_sensitive_data(text)
-
-            # title catching
-            title = self.extract_first_line_title(text, message_id, channel_config)
-            
-            # message link
-            link = f"https://t.me/{channel_name}/{message_id}"
-            
-            # media catch
-            media_info = self.extract_media_info(widget)
-            if media_info:
-                text += f"\n\n[Media: {media_info}]"
-            
-            return {
-                'id': message_id,
-                'title': title,
-                'text': text,
-                'link': link,
-                'pub_date': pub_date,
-                'channel': channel_name
-            }
-            
-        except Exception as e:
-            logger.warning(f"! Message parsing error: {e}")
-            return None
+        return self.get_parser().parse_widget(widget, channel_name, channel_config)
 
     # ID used for fallback    
     def extract_first_line_title(self, text, message_id, channel_config=None):
-
-        if not text or not text.strip():
-            return f"Message {message_id}"
-        
-        # split text to lines
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        if not lines:
-            return f"Message {message_id}"
-        
-        # whitch line to title (from cfg)
-        title_line_index = 0
-        if channel_config and 'title_line' in channel_config:
-            title_line_index = channel_config['title_line']
-        
-        if 0 <= title_line_index < len(lines):
-            first_line = lines[title_line_index]
-        else:
-            first_line = lines[0]
-        
-        # strip length 
-        max_length = 200
-        if len(first_line) <= max_length:
-            return first_line
-        else:
-            # strip by space
-            cut_pos = first_line.rfind(' ', 0, max_length)
-            if cut_pos > max_length * 0.8:
-                return first_line[:cut_pos] + "..."
-            else:
-                return first_line[:max_length-3] + "..."
+        return extract_first_line_title(text, message_id, channel_config)
             
     def extract_media_info(self, widget):
-        media_types = []
-        
-        # images
-        if widget.find('a', class_='tgme_widget_message_photo_wrap'):
-            media_types.append('Фото')
-        
-        # video
-        if widget.find('video') or widget.find('i', class_='tgme_widget_message_video_player'):
-            media_types.append('Видео')
-        
-        # docs
-        if widget.find('div', class_='tgme_widget_message_document'):
-            media_types.append('Документ')
-        
-        # audio
-        if widget.find('audio') or widget.find('div', class_='tgme_widget_message_voice'):
-            media_types.append('Аудио')
-        
-        return ', '.join(media_types) if media_types else None
+        return extract_media_info(widget)
 
+    # compiled once in sanitizer.py
     def sanitize_sensitive_data(self, text, channel_name=""):
-        if not text:
-            return text
-        
-        original_text = text
-        redactions = {}
-        
-        patterns = {
-            'AWS_ACCESS_KEY': r'AKIA[0-9A-Z]{16}',
-            'AWS_SECRET': r'(?<![A-Za-z0-9/+])(?:[A-Za-z0-9/+=]{40})(?![A-Za-z0-9/+=])',
-            'PRIVATE_KEY': r'-----BEGIN [A-Z ]*KEY.*?-----END [A-Z ]*KEY.*?-----',
-            'TELEGRAM_BOT_TOKEN': r'\d{8,12}:[A-Za-z0-9_-]{25,}',
-            'JWT_TOKEN': r'eyJ[A-Za-z0-9_-]+\.(?:[A-Za-z0-9_-]+\.)?[A-Za-z0-9_-]+',
-            'STRIPE_KEY': r'(?:sk|pk)_(?:live|test)_[A-Za-z0-9]{20,}',
-            'MONGODB_URI': r'mongodb\+srv://[^\s:]+:[^\s@]+@',
-            'DATABASE_URL': r'(?:postgres|mysql|sqlite)://[^\s:]+:[^\s@]+@',
-        }
-        
-        for pattern_name, pattern in patterns.items():
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                found_value = match.group()
-                replacement = f'[REDACTED_{pattern_name}]'
-                text = text.replace(found_value, replacement, 1)
-                
-                if pattern_name not in redactions:
-                    redactions[pattern_name] = 0
-                redactions[pattern_name] += 1
-        
-        # logs
-        if redactions:
-            redaction_list = ', '.join([f"{k}({v})" for k, v in redactions.items()])
-            logger.warning(f"!!! {channel_name}: Redacted sensitive data - {redaction_list}")
-        
-        return text
+        return sanitize_sensitive_data(text, channel_name)
  
-    def generate_rss_feed(self, channel_config, messages):
+    def generate_rss_feed(self, channel_config, messages, state=None):
         
         channel_name = channel_config['name']
         rss_filename = f"rss_feeds/{channel_name}.xml"
-        data_filename = f"channel_data/{channel_name}.json"
-        
-        # collecting
-        all_messages = list(messages)
-        
-        # cheking json
-        if os.path.exists(data_filename):
-            try:
-                with open(data_filename, 'r', encoding='utf-8') as f:
-                    old_data = json.load(f)
-                
-                for old_msg in old_data.get('messages', []):
-                    all_messages.append({
-                        'id': old_msg['id'],
-                        'title': old_msg['title'],
-                        'text': old_msg['text'],
-                        'link': old_msg['link'],
-                        'pub_date': datetime.fromisoformat(old_msg['pub_date']),
-                        'channel': channel_name
-                    })
-                
-                logger.info(f"✓ Added {len(old_data.get('messages', []))} old messages")
-            except Exception as e:
-                logger.warning(f"Could not read old data: {e}")
-        
-        # deleting dupl
-        unique_messages = {}
-        for msg in all_messages:
-            if msg['id'] not in unique_messages:
-                unique_messages[msg['id']] = msg
-        
-        # RSS with Atom namespace
-        feed = feedgenerator.Rss201rev2Feed(
-            title=channel_config.get('title', f"Channel @{channel_name}"),
-            link=f"https://t.me/{channel_name}",
-            description=channel_config.get('description', f"RSS of @{channel_name}"),
-            language='ru',
-            lastBuildDate=datetime.now(timezone.utc),
-        )
- 
-        # atom:link for self-reference        
-        feed.feed['atom_link'] = {
-            'href': f"https://<user_name>.github.io/<rep_name>/{channel_name}.xml",
-            'rel': 'self',
-            'type': 'application/rss+xml'
-        }
         
-        sorted_msgs = sorted(
-            unique_messages.values(),
-            key=lambda x: int(x['id']),
-            reverse=True
-        )
-       # add to feed        
-        for message in sorted_msgs:
-            feed.add_item(
-                title=message['title'],
-                link=message['link'],
-                description=message['text'],
-                pubdate=message['pub_date'],
-                unique_id=f"telegram_{channel_name}_{message['id']}",
-                unique_id_is_permalink=False
-            )
+        # archive + new
+        if state is None:
+            state = self.load_channel_state(channel_name)
+        state.merge(messages)
         
-        with open(rss_filename, 'w', encoding='utf-8') as f:
-            feed.write(f, 'utf-8')
+        sorted_msgs = state.feed_messages()
+        links = [('self', self.feed_url(channel_name))]
+
+        # bounded head, full pages moved to the archive
+        if self.settings['feed_window']:
+            sorted_msgs, pages = self.write_archive_pages(channel_config, sorted_msgs)
+            if pages:
+                links.append(('prev-archive', self.feed_url(channel_name, pages)))
+
+        formats = self.settings['feed_formats']
+        feed_urls = {fmt: self.feed_url(channel_name, suffix=WRITERS[fmt].suffix) for fmt in formats}
+        updated = max((m.get('edited') or m['pub_date'] for m in sorted_msgs), default=None)
+
+        # streamed item by item; in a worker process the records have to be a list
+        self.write_feed_files(f"rss_feeds/{channel_name}", formats, channel_config, sorted_msgs, updated, feed_urls, links)
+
+        if self.feed_store is not None:
+            for fmt in formats:
+                with open(f"rss_feeds/{channel_name}{WRITERS[fmt].suffix}", 'r', encoding='utf-8') as f:
+                    self.feed_store.publish_feed(channel_name, f.read(), fmt)
         
-        logger.info(f"✓ RSS: {len(unique_messages)} total items")
+        logger.info(f"✓ RSS: {len(sorted_msgs)} total items")
         return rss_filename
 
+    def get_duplicate_index(self):
+        if self.duplicate_index is None:
+            self.duplicate_index = NearDuplicateIndex(self.settings['fingerprint_path'], self.settings['duplicate_distance'])
+        return self.duplicate_index
+
+    # simhash of every new message, oldest first so the first post of a story is the canonical one;
+    # the whole archive once, when there is no index yet
+    def fingerprint_messages(self):
+        if not self.settings['near_duplicates']:
+            return
+
+        index = self.get_duplicate_index()
+        if index.entries:
+            messages = [m for msgs in self.run_messages.values() for m in msgs]
+        else:
+            messages = [
+                m for c in self.channels['channels']
+                for m in self.load_channel_state(c['name'], full=True).messages.values()
+            ]
+
+        for message in sorted(messages, key=lambda m: m['pub_date']):
+            canonical = index.add(message['channel'], message['id'], message['text'])
+            if canonical is not None:
+                with self.metrics.channel(message['channel']):
+                    self.metrics.count('near_duplicates')
+
+        written = index.save()
+        if written:
+            logger.info(f"✓ Fingerprints: {written} messages, {len(index.entries)} in index")
+
+    # cve ids, hashes, ips, domains, urls of new messages -> channel_data/.<name>_indicators
+    # and one published json per indicator; a channel without an index gets its whole archive
+    def index_indicators(self):
+        if not self.settings['indicators']:
+            return
+
+        written = 0
+        for channel_config in self.channels['channels']:
+            channel_name = channel_config['name']
+            index_file = f"channel_data/.{channel_name}_indicators"
+            if os.path.exists(index_file) and not self.run_messages.get(channel_name):
+                continue
+
+            index = IndicatorIndex(index_file)
+            if index.exists:
+                messages = self.run_messages[channel_name]
+            else:
+                messages = list(self.load_channel_state(channel_name, full=True).messages.values())
+
+            added, removed = index.update(messages)
+            if added or removed or not index.exists:
+                index.save()
+            if added or removed:
+                with self.metrics.channel(channel_name):
+                    self.metrics.count('indicators_new', sum(len(ids) for ids in added.values()))
+                written += publish_indicators(
+                    self.settings['indicators_dir'], channel_name, added, removed, {m['id']: m for m in messages}
+                )
+
+        if written:
+            logger.info(f"✓ Indicators: {written} files updated in {self.settings['indicators_dir']}")
+
+    # new messages into the static search index; every archive once, when there is none yet
+    def update_search_index(self):
+        if not self.settings['search_index']:
+            return
+
+        index = SearchIndex(self.settings['search_dir'])
+        if index.exists:
+            messages = [m for msgs in self.run_messages.values() for m in msgs]
+        else:
+            messages = [
+                m for c in self.channels['channels']
+                for m in self.load_channel_state(c['name'], full=True).messages.values()
+            ]
+        if not messages:
+            return
+
+        # oldest first: doc numbers follow posting order
+        new, shards = index.add(sorted(messages, key=lambda m: m['pub_date']))
+        logger.info(f"✓ Search: {new} new documents, {shards} shards updated, {len(index.docs)} total")
+
+    # aggregate_feed setting (all channels) + list.json "filtered_feeds"
+    def get_feed_filters(self):
+        definitions = list(self.channels.get('filtered_feeds', []))
+        if self.settings['aggregate_feed']:
+            definitions.insert(0, {'name': self.settings['aggregate_feed'], 'title': 'All channels'})
+
+        channel_names = {c['name'] for c in self.channels['channels']}
+        feed_filters = []
+        for definition in definitions:
+            if definition['name'] in channel_names:
+                logger.warning(f"! Feed {definition['name']} has the name of a channel, skipped")
+                continue
+            feed_filters.append(FeedFilter(definition, self.settings['aggregate_limit']))
+        return feed_filters
+
+    # cross-channel feeds: last result + this run's messages, heap-merged;
+    # every archive is read only when a feed is new, its definition changed or on rebuild
+    def update_aggregate_feeds(self, rebuild=False):
+        feed_filters = self.get_feed_filters()
+        if not feed_filters:
+            return
+
+        channel_names = {c['name'] for c in self.channels['channels']}
+        changed = [newest_first(messages) for messages in self.run_messages.values()]
+        full = None
+        canonical = self.get_duplicate_index().canonical if self.settings['near_duplicates'] else None
+
+        for feed_filter in feed_filters:
+            state_file = f"channel_data/.{feed_filter.name}_aggregate"
+            fingerprint, previous = load_aggregate(state_file)
+
+            if rebuild or fingerprint != feed_filter.fingerprint:
+                if full is None:
+                    full = [
+                        newest_first(self.load_channel_state(name, full=True).messages.values())
+                        for name in sorted(channel_names)
+                    ]
+                items = feed_filter.merge([], full, channel_names, canonical)
+            elif changed:
+                items = feed_filter.merge(previous, changed, channel_names, canonical)
+            else:
+                continue
+
+            if not rebuild and fingerprint == feed_filter.fingerprint and items == previous:
+                continue
+
+            save_aggregate(state_file, feed_filter.fingerprint, items)
+            self.write_aggregate_feed(feed_filter, items)
+            logger.info(f"✓ Feed {feed_filter.name}: {len(items)} items")
+
+    def write_aggregate_feed(self, feed_filter, items):
+        titles = {c['name']: c.get('title', c['name']) for c in self.channels['channels']}
+        feed_config = {
+            'name': feed_filter.name,
+            'title': feed_filter.definition.get('title', feed_filter.name),
+            'description': feed_filter.definition.get('description', feed_filter.definition.get('title', feed_filter.name)),
+            'link': self.settings['feed_base_url']
+        }
+
+        # source channel in the title, guid as in the channel's own feed
+        records = [
+            (m['id'], f"[{titles.get(m['channel'], m['channel'])}] {m['title']}", m['text'], m['link'], m['pub_date'], m['channel'])
+            for m in items
+        ]
+        formats = self.settings['feed_formats']
+        feed_urls = {fmt: self.feed_url(feed_filter.name, suffix=WRITERS[fmt].suffix) for fmt in formats}
+        updated = max((m['pub_date'] for m in items), default=None)
+        links = [('self', feed_urls['rss'])] if 'rss' in feed_urls else ()
+        write_feeds(f"rss_feeds/{feed_filter.name}", formats, feed_config, records, updated, feed_urls, links)
+
+        if self.feed_store is not None:
+            for fmt in formats:
+                with open(f"rss_feeds/{feed_filter.name}{WRITERS[fmt].suffix}", 'r', encoding='utf-8') as f:
+                    self.feed_store.publish_feed(feed_filter.name, f.read(), fmt)
+
+    # feed_writer record; an edited message also says when, and with guid_policy 'revision'
+    # gets a guid per content hash, so readers that ignore changed items show it again
+    def feed_record(self, message):
+        if not message.get('edited'):
+            return to_record(message)
+        revision = content_hash(message) if self.settings['guid_policy'] == 'revision' else None
+        return to_record(message) + (None, message['edited'], revision)
+
+    # all feed files of a channel there, e.g. not after a new format was added
+    def has_feed_files(self, channel_name):
+        return all(os.path.exists(f"rss_feeds/{channel_name}{WRITERS[fmt].suffix}") for fmt in self.settings['feed_formats'])
+
+    # messages -> feed files, rendering may run in a worker process
+    def write_feed_files(self, base_path, formats, channel_config, messages, updated, feed_urls=None, links=(), archive=False):
+        records = (self.feed_record(m) for m in messages)
+        if self.get_process_pool() is not None:
+            records = list(records)
+        return self.run_stage(write_feeds, base_path, formats, channel_config, records, updated, feed_urls, links, archive)
+
+    # public url of the head feed, or of archive page n
+    def feed_url(self, channel_name, page=None, suffix='.xml'):
+        if page is None:
+            return f"{self.settings['feed_base_url']}{channel_name}{suffix}"
+        return f"{self.settings['feed_base_url']}archive/{channel_name}/{page}{suffix}"
+
+    # archived pages so far: {'pages': n, 'last_id': newest id in page n}
+    def get_archive_cursor_file(self, channel_name):
+        return f"channel_data/.{channel_name}_archive"
+
+    def load_archive_cursor(self, channel_name):
+        try:
+            with open(self.get_archive_cursor_file(channel_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'pages': 0, 'last_id': 0}
+
+    # RFC 5005 archive: oldest archive_page_size posts past the window become page n+1,
+    # written once and never touched again. returns (head messages newest first, pages)
+    def write_archive_pages(self, channel_config, sorted_msgs):
+        channel_name = channel_config['name']
+        window = self.settings['feed_window']
+        page_size = self.settings['archive_page_size']
+        cursor = self.load_archive_cursor(channel_name)
+
+        # not archived yet, oldest first
+        pending = [m for m in reversed(sorted_msgs) if int(m['id']) > cursor['last_id']]
+
+        written = 0
+        while len(pending) - page_size >= window:
+            page, pending = pending[:page_size], pending[page_size:]
+            number = cursor['pages'] + 1
+
+            links = [('self', self.feed_url(channel_name, number)), ('current', self.feed_url(channel_name))]
+            if number > 1:
+                links.append(('prev-archive', self.feed_url(channel_name, number - 1)))
+
+            page_path = f"rss_feeds/archive/{channel_name}/{number}"
+            os.makedirs(os.path.dirname(page_path), exist_ok=True)
+            updated = max(m['pub_date'] for m in page)
+            self.write_feed_files(page_path, ['rss'], channel_config, reversed(page), updated, None, links, True)
+
+            if self.feed_store is not None:
+                with open(f"{page_path}.xml", 'r', encoding='utf-8') as f:
+                    self.feed_store.publish_archive_page(channel_name, number, f.read())
+
+            cursor = {'pages': number, 'last_id': int(page[-1]['id'])}
+            written += 1
+
+        if written:
+            with open(self.get_archive_cursor_file(channel_name), 'w', encoding='utf-8') as f:
+                json.dump(cursor, f)
+            logger.info(f"✓ Archive: {written} new page(s), {cursor['pages']} total")
+
+        # head is the newest `window` only; the rest waits for a full page (RFC 5005 keeps
+        # the subscription document bounded, however much a backfill brought in)
+        return list(reversed(pending))[:window], cursor['pages']
+
     # saving data
-    def save_channel_data(self, channel_name, messages):
+    def save_channel_data(self, channel_name, messages, state=None):
         
         data_filename = f"channel_data/{channel_name}.json"
         
-        # old data
-        old_messages = []
-        if os.path.exists(data_filename):
-            try:
-                with open(data_filename, 'r', encoding='utf-8') as f:
-                    old_data = json.load(f)
-                old_messages = old_data.get('messages', [])
-            except:
-                pass
-        
-        # id dict 
-        all_msgs_dict = {}
+        # archive + new
+        if state is None:
+            state = self.load_channel_state(channel_name)
+        state.merge(messages)
         
-        for msg in old_messages:
-            all_msgs_dict[msg['id']] = msg
-        
-        for msg in messages:
-            all_msgs_dict[msg['id']] = {
-                'id': msg['id'],
-                'title': msg['title'],
-                'text': msg['text'],
-                'link': msg['link'],
-                'pub_date': msg['pub_date'].isoformat()
-            }
-        
-        # sorting
-        sorted_msgs = sorted(
-            all_msgs_dict.values(),
-            key=lambda x: x['pub_date'],
-            reverse=True
-        )
+        if self.settings['storage'] in ('sqlite', 'log'):
+            self.save_channel_data_archive(channel_name, state)
+            return
+
+        # nothing new or edited: the file would only get a new last_update
+        if not state.changed and os.path.exists(data_filename):
+            return
+
+        sorted_msgs = state.archive_records()
         
         # saving
         data = {
             'channel': channel_name,
             'last_update': datetime.now(timezone.utc).isoformat(),
             'messages_count': len(sorted_msgs),
+            'last_message_id': state.last_message_id,
             'messages': sorted_msgs
         }
         
@@ -425,61 +1195,567 @@ class TelegramRSSGenerator:
         
         logger.info(f"✓ Data: {len(sorted_msgs)} total items")
 
-    def update_all_channels(self):
+    def save_channel_data_archive(self, channel_name, state):
+        archive = self.get_archive_db()
+        channel_config = next((c for c in self.channels['channels'] if c['name'] == channel_name), {})
+
+        written = archive.upsert(channel_name, state.changed_records())
+        archive.apply_retention(
+            channel_name,
+            channel_config.get('retention_count', self.settings['retention_count']),
+            channel_config.get('retention_days', self.settings['retention_days'])
+        )
+        state.changed.clear()
+
+        if self.settings['sqlite_export_json']:
+            archive.export_json(channel_name)
+
+        logger.info(f"✓ Data: {written} rows written, {archive.count(channel_name)} total items ({self.settings['storage']})")
+
+    # one channel: scrape, rss, data, flag
+    # mode 'backfill': initial pull even for a known channel
+    def process_channel(self, channel_config, mode=None):
+        started = time.monotonic()
+        with self.metrics.channel(channel_config['name']):
+            result = self._process_channel(channel_config, mode)
+
+        result['elapsed'] = round(time.monotonic() - started, 2)
+        return result
+
+    def _process_channel(self, channel_config, mode=None):
+
+        channel_name = channel_config['name']
+        result = {'channel': channel_name, 'mode': None, 'status': 'error', 'messages': 0}
+
+        try:
+            known = mode != 'backfill' and self.is_channel_initialized(channel_name)
+            # left open by an earlier run, filled before the page may count as unchanged
+            gap = remaining = self.load_gap(channel_name) if known else None
+
+            # known channel: first page checked before anything else
+            first_page = None
+            previous = validators = None
+            if self.settings['conditional_fetch'] and known and gap is None:
+                previous = self.load_validators(channel_name)
+                try:
+                    first_page, validators = self.fetch_first_page(channel_name, previous)
+                except Exception as e:
+                    logger.warning(f"! Conditional fetch failed for {channel_name}: {e}")
+
+                if validators is not None and first_page is None:
+                    # same posts as last run: no parse, no archive read, no writes
+                    # (not even a fresher etag, so the workflow has nothing to commit)
+                    self.metrics.count('not_modified')
+                    result['mode'] = 'conditional'
+                    result['status'] = 'unchanged'
+                    logger.info(f"✓ {channel_name} - not modified since last run")
+                    return result
+
+            # checking for initialize
+            # archive read once, reused below
+            with self.metrics.stage('load'):
+                state = self.load_channel_state(channel_name)
+
+            last_id = None
+            if known:
+                last_id = state.last_message_id
+
+            if last_id is not None:
+                # only newer than what we have
+                result['mode'] = 'incremental'
+                logger.info(f"\n{channel_name} [KNOWN CHANNEL]")
+                logger.info(f"  Mode: Incremental update (after: {last_id})")
+
+                messages, stopped = self.scrape_channel_messages_since(
+                    channel_name,
+                    last_id,
+                    channel_config,
+                    first_page
+                )
+
+                # the mark moves past what was missed: the missing range is kept as a gap
+                # (joined with an older one) and walked again next run
+                if stopped is not None:
+                    remaining = {'after': gap['after'] if gap else last_id, 'before': stopped}
+                elif gap:
+                    older, stopped = self.scrape_channel_messages_since(
+                        channel_name,
+                        gap['after'],
+                        channel_config,
+                        before=gap['before']
+                    )
+                    messages = older + messages
+                    remaining = None if stopped is None else {'after': gap['after'], 'before': stopped}
+
+                # known posts of the first page (track_edits) are edits or nothing
+                messages = self.known_messages(state, messages, last_id, gap)
+            elif known:
+                # quick logic
+                limit = channel_config.get('regular_limit', 5)
+                result['mode'] = 'quick'
+                logger.info(f"\n{channel_name} [KNOWN CHANNEL]")
+                logger.info(f"  Mode: Quick update (limit: {limit})")
+                
+                messages = self.scrape_channel_messages_quick(
+                    channel_name, 
+                    limit, 
+                    channel_config,
+                    first_page
+                )
+            else:
+                # new channel - full scrape
+                limit = channel_config.get('initial_limit', 30)
+                result['mode'] = 'initial'
+                logger.info(f"\n{channel_name} [NEW CHANNEL]")
+                logger.info(f"  Mode: Initial pull, {self.settings['backfill_mode']} (limit: {limit})")
+                
+                messages = self.backfill_channel(
+                    channel_name, 
+                    limit, 
+                    channel_config
+                )
+            
+            # saving
+            if messages:
+                new = sum(1 for m in messages if m['id'] not in state.messages)
+                changed = state.merge(messages)
+                edited = len(state.edited)
+                self.metrics.count('messages_new', new)
+                self.metrics.count('messages_edited', edited)
+                # same post, rendered differently (title_line, sanitizer): rewritten, not edited
+                self.metrics.count('messages_rewritten', len(changed) - new - edited)
+                self.metrics.count('messages_duplicate', len(messages) - len(changed))
+
+                if self.dry_run:
+                    result['status'] = 'ok' if changed else 'unchanged'
+                    result['messages'] = len(changed)
+                    logger.info(f"✓ {channel_name} - dry run, nothing written ({new} new, {edited} edited)\n")
+                    return result
+
+                # same content as stored: feed, archive and later stages stay as they are
+                if changed or not self.has_feed_files(channel_name):
+                    with self.metrics.stage('rss'):
+                        self.generate_rss_feed(channel_config, messages, state)
+                    with self.metrics.stage('save'):
+                        self.save_channel_data(channel_name, messages, state)
+                    self.run_messages[channel_name] = changed
+
+                # flag of inicialization changes
+                if not self.is_channel_initialized(channel_name):
+                    self.mark_channel_initialized(channel_name)
+
+                if remaining != gap:
+                    self.save_gap(channel_name, remaining)
+
+                # page seen as a whole only without a gap
+                if validators and remaining is None:
+                    self.save_validators(channel_name, validators)
+
+                if changed:
+                    result['status'] = 'ok'
+                    result['messages'] = len(changed)
+                    logger.info(f"✓ {channel_name} processed successfully ({new} new, {edited} edited)\n")
+                else:
+                    result['status'] = 'unchanged'
+                    logger.info(f"✓ {channel_name} - no new or edited messages\n")
+            elif result['mode'] == 'incremental':
+                # nothing new since last run; new validators only once the known
+                # post is seen on the page, a failed scrape must not mark it as seen
+                if remaining != gap and not self.dry_run:
+                    self.save_gap(channel_name, remaining)
+                if validators and validators != previous and first_page is not None and remaining is None and not self.dry_run:
+                    if self.parse_page_records(first_page, channel_name, channel_config, after_id=last_id)[2]:
+                        self.save_validators(channel_name, validators)
+                result['status'] = 'unchanged'
+                logger.info(f"✓ {channel_name} - no new messages\n")
+            else:
+                result['status'] = 'empty'
+                logger.warning(f"WARNING  {channel_name} - no messages collected\n")
+
+            # for the scheduler (archive + new)
+            result['posts_per_day'] = round(posting_rate(
+                (m['pub_date'] for m in state.messages.values()),
+                self.settings['schedule_window_days']
+            ), 3)
+            
+        except Exception as e:
+            result['error'] = str(e)
+            logger.error(f"! Error processing {channel_name}: {e}\n")
+
+        return result
+
+    # all channels from list.json, or just the given ones
+    def update_all_channels(self, channels=None, mode=None):
+
+        if channels is None:
+            channels = self.channels['channels']
 
         logger.info("=" * 50)
         logger.info("Updating started...")
         logger.info("=" * 50)
-        
-        for channel_config in self.channels['channels']:
-            channel_name = channel_config['name']
-            
-            try:
-                # checking for initialize
-                if self.is_channel_initialized(channel_name):
-                    # quick logic
-                    limit = channel_config.get('regular_limit', 5)
-                    logger.info(f"\n{channel_name} [KNOWN CHANNEL]")
-                    logger.info(f"  Mode: Quick update (limit: {limit})")
-                    
-                    messages = self.scrape_channel_messages_quick(
-                        channel_name, 
-                        limit, 
-                        channel_config
-                    )
-                else:
-                    # new channel - full scrape
-                    limit = channel_config.get('initial_limit', 30)
-                    logger.info(f"\n{channel_name} [NEW CHANNEL]")
-                    logger.info(f"  Mode: Initial pull with scroll (limit: {limit})")
-                    
-                    messages = self.scrape_channel_messages_with_scroll(
-                        channel_name, 
-                        limit, 
-                        channel_config
-                    )
-                
-                # saving
-                if messages:
-                    rss_file = self.generate_rss_feed(channel_config, messages)
-                    self.save_channel_data(channel_name, messages)
-                    
-                    # flag of inicialization changes
-                    if not self.is_channel_initialized(channel_name):
-                        self.mark_channel_initialized(channel_name)
-                    
-                    logger.info(f"✓ {channel_name} processed successfully ({len(messages)} messages)\n")
+
+        self.metrics = RunMetrics()
+        self.run_messages = {}
+        report_dir = self.settings['report_dir'] or 'reports'
+
+        started = time.time()
+        if self.bundle_dir is not None:
+            before = snapshot(p for c in channels for p in self.channel_files(c['name']))
+
+        try:
+            with profile_run(self.settings['profile'], report_dir):
+                if self.settings['async']:
+                    import asyncio
+
+                    results = asyncio.run(self.update_all_channels_async(channels, mode))
                 else:
-                    logger.warning(f"WARNING  {channel_name} - no messages collected\n")
-                
-                time.sleep(2)
-                
-            except Exception as e:
-                logger.error(f"! Error processing {channel_name}: {e}\n")
+                    results = []
+                    for channel_config in channels:
+                        results.append(self.process_channel(channel_config, mode))
+                        with self.metrics.stage('sleep'):
+                            time.sleep(self.settings['delay'])
+
+                # a shard leaves them to the merge
+                if not self.dry_run and self.bundle_dir is None:
+                    self.run_index_stages()
+        finally:
+            if not self.dry_run:
+                with self.metrics.stage('compaction'):
+                    self.compact_archive()
+                if self.bundle_dir is None:
+                    self.evict_page_cache()
+            with self.metrics.stage('shutdown'):
+                self.close_browser_pool()
+                self.close_process_pool()
+                self.close_archive_db()
+
+        if self.bundle_dir is not None and not self.dry_run:
+            self.write_shard_bundle(channels, results, before, started)
+
+        self.log_run_summary(results)
+        if not self.dry_run:
+            self.write_run_report(results)
         
         logger.info("=" * 50)
         logger.info("Update finished!")
         logger.info("=" * 50)
+        return results
+
+    # concurrent mode: blocking work runs in threads, host limiters keep t.me happy
+    async def update_all_channels_async(self, channels=None, mode=None):
+
+        if channels is None:
+            channels = self.channels['channels']
+
+        import asyncio
+
+        concurrency = max(int(self.settings['concurrency']), 1)
+        semaphore = asyncio.Semaphore(concurrency)
+        logger.info(f"  Async mode (concurrency: {concurrency})")
+
+        async def run_channel(channel_config):
+            async with semaphore:
+                return await asyncio.to_thread(self.process_channel, channel_config, mode)
+
+        # gather keeps list.json order
+        return await asyncio.gather(*(run_channel(c) for c in channels))
+
+    # files of one channel only: the part of the tree a shard owns
+    def channel_files(self, channel_name):
+        paths = [f"rss_feeds/{channel_name}{writer.suffix}" for writer in WRITERS.values()]
+        paths += [
+            f"channel_data/{channel_name}.json",
+            self.get_init_flag_file(channel_name),
+            self.get_validators_file(channel_name),
+            self.get_gap_file(channel_name),
+            self.get_archive_cursor_file(channel_name)
+        ]
+        for directory in (f"rss_feeds/archive/{channel_name}", os.path.join(self.settings['log_dir'], channel_name)):
+            for root, _, names in os.walk(directory):
+                paths += [os.path.join(root, name) for name in names]
+        return [os.path.normpath(p) for p in paths if os.path.exists(p)]
+
+    def write_shard_bundle(self, channels, results, before, started):
+        after = snapshot(p for c in channels for p in self.channel_files(c['name']))
+        run = {
+            'shard': self.shard,
+            'started': datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            'results': results,
+            'messages': {
+                channel_name: list(map(ChannelState(channel_name).to_record, messages))
+                for channel_name, messages in self.run_messages.items()
+            }
+        }
+        files, removed = write_bundle(self.bundle_dir, run, before, after, started)
+        logger.info(f"✓ Bundle {self.bundle_dir}: {len(files)} files, {len(removed)} removed")
+
+    # shard bundles -> tree, then what spans channels once over all their messages;
+    # due: the shards ran --due, their polls go into the schedule here
+    def merge_bundles(self, paths, due=False):
+        self.metrics = RunMetrics()
+        self.run_messages = {}
+        results = []
+        owners = {}
+
+        try:
+            with self.metrics.stage('merge'):
+                for path in paths:
+                    if not os.path.exists(os.path.join(path, 'run.json')):
+                        logger.info(f"  No bundle in {path} (nothing due?), skipped")
+                        continue
+
+                    bundle = read_bundle(path)
+                    for channel_name in bundle['messages']:
+                        if channel_name in owners:
+                            raise ValueError(f"{channel_name} is in {owners[channel_name]} and {path}, shards of different N?")
+                        owners[channel_name] = path
+
+                    written = apply_bundle(path, bundle)
+                    results += bundle['results']
+
+                    for channel_name, records in bundle['messages'].items():
+                        state = ChannelState.from_records(channel_name, records)
+                        self.run_messages[channel_name] = list(state.messages.values())
+
+                        # one sqlite file for all channels: rows come from the messages, not files
+                        if self.settings['storage'] == 'sqlite':
+                            self.get_channel_archive(channel_name)
+                            state.changed.update(state.messages)
+                            self.save_channel_data_archive(channel_name, state)
+
+                    logger.info(f"✓ Bundle {path} (shard {bundle['shard']}): {len(bundle['results'])} channels, {written} files")
+
+            self.run_index_stages()
+            self.evict_page_cache()
+        finally:
+            self.close_process_pool()
+            self.close_archive_db()
+
+        if due:
+            # shards never save the schedule: their polls are charged here
+            scheduler = PollScheduler(self.settings)
+            scheduler.charge(len(results))
+            scheduler.record(results)
+            scheduler.save()
+
+        self.log_run_summary(results)
+        self.write_run_report(results)
+        return results
+
+    # everything after the channels, over this run's new and edited messages
+    def run_index_stages(self):
+        with self.metrics.stage('fingerprint'):
+            self.fingerprint_messages()
+        with self.metrics.stage('indicators'):
+            self.index_indicators()
+        with self.metrics.stage('search'):
+            self.update_search_index()
+        with self.metrics.stage('aggregate'):
+            self.update_aggregate_feeds()
+
+    # list.json entries by name, in the given order; unknown names are skipped
+    def select_channels(self, names=None):
+        if not names:
+            return self.channels['channels']
+
+        by_name = {c['name']: c for c in self.channels['channels']}
+        for name in names:
+            if name not in by_name:
+                logger.warning(f"! Unknown channel: {name}")
+        return [by_name[name] for name in names if name in by_name]
+
+    # feeds again from the archive, no network: after a feed setting changed or a feed got lost
+    def render_channels(self, channels=None):
+        channels = self.select_channels() if channels is None else channels
+        try:
+            for channel_config in channels:
+                channel_name = channel_config['name']
+                state = self.load_channel_state(channel_name)
+                if not state.messages:
+                    logger.warning(f"! {channel_name} - nothing archived, no feed")
+                    continue
+                if self.dry_run:
+                    logger.info(f"✓ {channel_name} - dry run, would render {len(state.messages)} messages")
+                    continue
+                self.generate_rss_feed(channel_config, [], state)
+
+            # cross-channel feeds rebuilt from the archives too
+            if not self.dry_run:
+                self.update_aggregate_feeds(rebuild=True)
+        finally:
+            self.close_process_pool()
+            self.close_archive_db()
+
+    # fingerprints, indicators, search and cross-channel feeds over whole archives, no network:
+    # after the extraction rules changed or an index got lost. known messages cost only a comparison
+    def index_channels(self, channels=None):
+        channels = self.select_channels() if channels is None else channels
+        self.run_messages = {}
+        try:
+            for channel_config in channels:
+                channel_name = channel_config['name']
+                self.run_messages[channel_name] = list(self.load_channel_state(channel_name, full=True).messages.values())
+                logger.info(f"✓ {channel_name}: {len(self.run_messages[channel_name])} archived messages")
+
+            if not self.dry_run:
+                self.run_index_stages()
+        finally:
+            self.close_archive_db()
+
+    # cached pages (page_cache) parsed again, no network: after a parser or title fix.
+    # every distinct page once, oldest first, so the newest copy of a message wins;
+    # what comes out different goes through feeds, archive and index stages like an edit
+    def replay_channels(self, channels=None):
+        channels = self.select_channels() if channels is None else channels
+        self.metrics = RunMetrics()
+        self.run_messages = {}
+        results = []
+
+        try:
+            for channel_config in channels:
+                started = time.monotonic()
+                with self.metrics.channel(channel_config['name']):
+                    result = self.replay_channel(channel_config)
+                result['elapsed'] = round(time.monotonic() - started, 2)
+                results.append(result)
+
+            if not self.dry_run:
+                self.run_index_stages()
+        finally:
+            self.close_process_pool()
+            self.close_archive_db()
+
+        self.log_run_summary(results)
+        return results
+
+    def replay_channel(self, channel_config):
+        channel_name = channel_config['name']
+        result = {'channel': channel_name, 'mode': 'replay', 'status': 'empty', 'messages': 0}
+        cache = self.get_page_cache()
+
+        pages = cache.pages(channel_name)
+        if not pages:
+            logger.warning(f"! {channel_name} - no cached pages")
+            return result
+
+        with self.metrics.stage('load'):
+            state = self.load_channel_state(channel_name, full=True)
+
+        changed = {}
+        for fingerprint in pages:
+            try:
+                with self.metrics.stage('page_cache'):
+                    content = cache.read(fingerprint)
+            except OSError as e:
+                logger.warning(f"! {channel_name}: cached page {fingerprint} unreadable: {e}")
+                continue
+            # archived posts only: what retention removed stays removed
+            messages = self.known_messages(state, self.parse_page_records(content, channel_name, channel_config)[0])
+            for message in state.merge(messages, reparsed=True):
+                changed[message['id']] = message
+        changed = list(changed.values())
+        self.metrics.count('messages_rewritten', len(changed))
+
+        result['status'] = 'ok' if changed else 'unchanged'
+        result['messages'] = len(changed)
+        if not changed:
+            logger.info(f"✓ {channel_name} - {len(pages)} cached pages, nothing parses differently")
+            return result
+        if self.dry_run:
+            logger.info(f"✓ {channel_name} - dry run, {len(changed)} messages would change")
+            return result
+
+        with self.metrics.stage('rss'):
+            self.generate_rss_feed(channel_config, [], state)
+        with self.metrics.stage('save'):
+            self.save_channel_data(channel_name, [], state)
+        self.run_messages[channel_name] = changed
+        logger.info(f"✓ {channel_name} - {len(pages)} cached pages, {len(changed)} messages changed")
+        return result
+
+    # one pass of the scheduler: only channels whose poll is due, then reschedule them
+    def update_due_channels(self, scheduler=None, channels=None):
+        scheduler = scheduler or PollScheduler(self.settings)
+        channels = self.channels['channels'] if channels is None else channels
+
+        due = scheduler.due(channels, share=parse_shard(self.shard) if self.shard else None)
+        if not due:
+            wait = scheduler.next_due_in(channels)
+            if wait:
+                logger.info(f"⏱ No channels due (next in {wait / 60:.0f} min)")
+            else:
+                logger.info(f"⏱ Due channels held back by the budget")
+            if not self.dry_run and self.bundle_dir is None:
+                scheduler.save()
+            return []
+
+        logger.info(f"⏱ {len(due)}/{len(channels)} channels due")
+        results = self.update_all_channels(due)
+        if not self.dry_run and self.bundle_dir is None:
+            scheduler.record(results)
+            scheduler.save()
+        return results
+
+    # long-running: poll due channels, sleep until the next one is due
+    def run_daemon(self):
+        scheduler = PollScheduler(self.settings)
+        logger.info(f"⏱ Daemon started ({len(self.channels['channels'])} channels)")
+
+        while True:
+            results = self.update_due_channels(scheduler)
+            if self.feed_store is not None and any(r['status'] == 'ok' for r in results):
+                self.feed_store.publish_index(self.channels)
+            wait = scheduler.next_due_in(self.channels['channels'])
+            # budget may hold due channels back, look again in a while
+            time.sleep(min(max(wait, 30), self.settings['schedule_min_interval']))
+
+    def log_run_summary(self, results):
+
+        logger.info("-" * 50)
+        logger.info("Summary:")
+        for result in results:
+            line = f"  {result['channel']}: {result['status']} ({result['mode']}, {result['messages']} messages, {result['elapsed']}s)"
+            if result.get('error'):
+                line += f" - {result['error']}"
+            logger.info(line)
+
+        ok = sum(1 for r in results if r['status'] in ('ok', 'unchanged'))
+        logger.info(f"  Total: {ok}/{len(results)} channels updated")
+
+        stages = self.metrics.report(results)['stages']
+        if stages:
+            logger.info("  Time: " + ', '.join(f"{name} {seconds:.2f}s" for name, seconds in stages.items()))
+
+    # run_report.json + metrics.prom (node_exporter textfile) in report_dir
+    def write_run_report(self, results):
+        report_dir = self.settings['report_dir']
+        if not report_dir:
+            return
+
+        report = self.metrics.report(results)
+        write_json_report(os.path.join(report_dir, 'run_report.json'), report)
+        write_prometheus(os.path.join(report_dir, 'metrics.prom'), report)
+        logger.info(f"✓ Run report: {report_dir}/run_report.json")
+
+    # daemon + http server answering from memory
+    def serve(self):
+        from feed_server import FeedStore, FeedServer
+
+        self.feed_store = FeedStore()
+        self.feed_store.load_feeds('rss_feeds')
+        self.feed_store.publish_index(self.channels)
+
+        server = FeedServer(
+            self.feed_store,
+            self.settings['serve_host'],
+            self.settings['serve_port'],
+            self.settings['serve_max_age']
+        ).start()
+
+        try:
+            self.run_daemon()
+        finally:
+            server.stop()
 
     def get_rss_urls(self):
         rss_urls = []
@@ -500,13 +1776,94 @@ class TelegramRSSGenerator:
         return rss_urls
 
 
+# python update.py [fetch|render|index|replay|backfill|merge] [--channels a,b] [--shard i/N] [--dry-run]
 def main():
 
+    # for every command; SUPPRESS, so "--channels x render" and "render --channels x" both work
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--channels', default=argparse.SUPPRESS, help='comma-separated channel names (default: all in list.json)')
+    common.add_argument('--dry-run', action='store_true', default=argparse.SUPPRESS, help='do everything but write')
+    common.add_argument('--shard', default=argparse.SUPPRESS, help='i/N: only the i-th of N stable slices of the channels')
+    common.add_argument('--bundle', default=argparse.SUPPRESS, help='where a shard puts its bundle (default: bundles/shard-i)')
+
+    parser = argparse.ArgumentParser(description='Telegram channels -> RSS', parents=[common])
+    parser.add_argument('--due', action='store_true', help='only channels the scheduler says are due')
+    parser.add_argument('--daemon', action='store_true', help='keep running, polling channels when due')
+    parser.add_argument('--serve', action='store_true', help='daemon + serve feeds over http from memory')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    fetch = commands.add_parser('fetch', parents=[common], help='scrape channels, update archive, feeds and indexes (default)')
+    fetch.add_argument('--due', action='store_true', default=argparse.SUPPRESS, help='only channels the scheduler says are due')
+    commands.add_parser('render', parents=[common], help='rebuild feeds from the archive, no network')
+    commands.add_parser('index', parents=[common], help='rebuild fingerprints, indicators, search and cross-channel feeds from the archive')
+    commands.add_parser('replay', parents=[common], help='parse cached pages again (page_cache), no network')
+    backfill = commands.add_parser('backfill', parents=[common], help='initial pull again, known channels too')
+    backfill.add_argument('--limit', type=int, help='messages per channel (default: initial_limit)')
+    backfill.add_argument('--days', type=int, help='only messages of the last n days (default: backfill_days)')
+    merge = commands.add_parser('merge', help='combine shard bundles, then fingerprints, indexes and cross-channel feeds')
+    merge.add_argument('bundles', nargs='+', help='bundle directories')
+    args = parser.parse_args()
+
+    command = args.command or 'fetch'
+    names = [name.strip() for name in getattr(args, 'channels', '').split(',') if name.strip()]
+
     print("=== RSS Generator ===")
     print()
     
     generator = TelegramRSSGenerator()
-    generator.update_all_channels()
+    generator.dry_run = getattr(args, 'dry_run', False)
+    channels = generator.select_channels(names) if names else None
+    if names and not channels:
+        parser.error('none of --channels is in list.json')
+
+    if getattr(args, 'shard', None):
+        try:
+            index, count = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        channels = [c for c in generator.select_channels(names) if shard_of(c['name'], count) == index]
+
+        if command in ('fetch', 'backfill') and not generator.dry_run:
+            # a fresh bundle every run, a stale one would be merged again
+            generator.shard = args.shard
+            generator.bundle_dir = getattr(args, 'bundle', None) or os.path.join('bundles', f"shard-{index}")
+            shutil.rmtree(generator.bundle_dir, ignore_errors=True)
+            os.makedirs(generator.bundle_dir)
+            generator.settings['report_dir'] = os.path.join(generator.bundle_dir, 'reports')
+        logger.info(f"  Shard {args.shard}: {len(channels)} channels")
+
+    if args.daemon or args.serve:
+        try:
+            if args.serve:
+                generator.serve()
+            else:
+                generator.run_daemon()
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        return
+    elif command == 'render':
+        generator.render_channels(channels)
+    elif command == 'index':
+        generator.index_channels(channels)
+        return
+    elif command == 'replay':
+        generator.replay_channels(channels)
+    elif command == 'merge':
+        generator.merge_bundles(args.bundles, args.due)
+    elif command == 'backfill':
+        if args.days is not None:
+            generator.settings['backfill_days'] = args.days
+        channels = generator.select_channels() if channels is None else channels
+        if args.limit:
+            channels = [dict(c, initial_limit=args.limit) for c in channels]
+        generator.update_all_channels(channels, mode='backfill')
+    elif args.due:
+        generator.update_due_channels(channels=channels)
+    else:
+        generator.update_all_channels(channels)
+
+    if generator.dry_run:
+        return
     
     print("\n=== Created RSS feeds ===")
     rss_urls = generator.get_rss_urls()